@@ -24,6 +24,13 @@ def dm_create_body(user, u_ids):
         'u_ids': u_ids_list
     }
 
+# A history counts up one at a time from 0 to total, each point no later than
+# time_stamp. The requests before it may span more than one second
+def assert_history(history, field, total, time_stamp):
+    assert [point[field] for point in history] == list(range(total + 1))
+    assert [point['time_stamp'] for point in history] == sorted(point['time_stamp'] for point in history)
+    assert history[-1]['time_stamp'] <= time_stamp
+
 ###                       END HELPER FUNCTIONS                         ###
 
 # Time stamp 
@@ -83,8 +90,8 @@ def test_users_stats_v1_no_msg(setup_user_data):
         'token': users['user1']['token'],
     }).json()
 
-    assert dreams_stats['channels_exist'] == [{'num_channels_exist': 1,'time_stamp': time_stamp}]
-    assert dreams_stats['dms_exist'] == [{'num_dms_exist': 1, 'time_stamp': time_stamp}]
+    assert_history(dreams_stats['channels_exist'], 'num_channels_exist', 1, time_stamp)
+    assert_history(dreams_stats['dms_exist'], 'num_dms_exist', 1, time_stamp)
     assert dreams_stats['messages_exist'] == [{'num_messages_exist': 0, 'time_stamp': time_stamp}]
     assert dreams_stats['utilization_rate'] == 0.4
 
@@ -130,9 +137,9 @@ def test_users_stats_v1_loner(setup_user_data):
         'token': users['user1']['token'],
     }).json()
 
-    assert dreams_stats['channels_exist'] == [{'num_channels_exist': 1,'time_stamp': time_stamp}]
+    assert_history(dreams_stats['channels_exist'], 'num_channels_exist', 1, time_stamp)
     assert dreams_stats['dms_exist'] == [{'num_dms_exist': 0, 'time_stamp': time_stamp}]
-    assert dreams_stats['messages_exist'] == [{'num_messages_exist': 4, 'time_stamp': time_stamp}]
+    assert_history(dreams_stats['messages_exist'], 'num_messages_exist', 4, time_stamp)
     assert dreams_stats['utilization_rate'] == 0.2
 
 
@@ -218,9 +225,9 @@ def test_users_stats_v1_invite_join(setup_user_data):
         'token': users['user1']['token'],
     }).json()
 
-    assert dreams_stats['channels_exist'] == [{'num_channels_exist': 1,'time_stamp': time_stamp}]
-    assert dreams_stats['dms_exist'] == [{'num_dms_exist': 1, 'time_stamp': time_stamp}]
-    assert dreams_stats['messages_exist'] == [{'num_messages_exist': 6, 'time_stamp': time_stamp}]
+    assert_history(dreams_stats['channels_exist'], 'num_channels_exist', 1, time_stamp)
+    assert_history(dreams_stats['dms_exist'], 'num_dms_exist', 1, time_stamp)
+    assert_history(dreams_stats['messages_exist'], 'num_messages_exist', 6, time_stamp)
     assert dreams_stats['utilization_rate'] == 0.6
 
 
@@ -247,9 +254,9 @@ def test_users_stats_v1_partial_util(setup_user_data):
         'token': users['user1']['token'],
     }).json()
 
-    assert dreams_stats['channels_exist'] == [{'num_channels_exist': 1,'time_stamp': time_stamp}]
+    assert_history(dreams_stats['channels_exist'], 'num_channels_exist', 1, time_stamp)
     assert dreams_stats['dms_exist'] == [{'num_dms_exist': 0, 'time_stamp': time_stamp}]
-    assert dreams_stats['messages_exist'] == [{'num_messages_exist': 1, 'time_stamp': time_stamp}]
+    assert_history(dreams_stats['messages_exist'], 'num_messages_exist', 1, time_stamp)
     assert dreams_stats['utilization_rate'] == 0.2
 
 
@@ -345,9 +352,9 @@ def test_users_stats_v1_active(setup_user_data):
         'token': users['user1']['token']
     }).json()
 
-    assert dreams_stats1['channels_exist'] == [{'num_channels_exist': 5,'time_stamp': time_stamp}]
-    assert dreams_stats1['dms_exist'] == [{'num_dms_exist': 5, 'time_stamp': time_stamp}]
-    assert dreams_stats1['messages_exist'] == [{'num_messages_exist': 7, 'time_stamp': time_stamp}]
+    assert_history(dreams_stats1['channels_exist'], 'num_channels_exist', 5, time_stamp)
+    assert_history(dreams_stats1['dms_exist'], 'num_dms_exist', 5, time_stamp)
+    assert_history(dreams_stats1['messages_exist'], 'num_messages_exist', 7, time_stamp)
     assert dreams_stats1['utilization_rate'] == 0.4
 
     time_stamp = round(datetime.now().timestamp())
@@ -355,9 +362,9 @@ def test_users_stats_v1_active(setup_user_data):
         'token': users['user2']['token'],
     }).json()
 
-    assert dreams_stats2['channels_exist'] == [{'num_channels_exist': 5,'time_stamp': time_stamp}]
-    assert dreams_stats2['dms_exist'] == [{'num_dms_exist': 5, 'time_stamp': time_stamp}]
-    assert dreams_stats2['messages_exist'] == [{'num_messages_exist': 7, 'time_stamp': time_stamp}]
+    assert_history(dreams_stats2['channels_exist'], 'num_channels_exist', 5, time_stamp)
+    assert_history(dreams_stats2['dms_exist'], 'num_dms_exist', 5, time_stamp)
+    assert_history(dreams_stats2['messages_exist'], 'num_messages_exist', 7, time_stamp)
     assert dreams_stats2['utilization_rate'] == 0.4
     
     time_stamp = round(datetime.now().timestamp())
@@ -365,7 +372,7 @@ def test_users_stats_v1_active(setup_user_data):
         'token': users['user3']['token'],
     }).json()
 
-    assert dreams_stats3['channels_exist'] == [{'num_channels_exist': 5,'time_stamp': time_stamp}]
-    assert dreams_stats3['dms_exist'] == [{'num_dms_exist': 5, 'time_stamp': time_stamp}]
-    assert dreams_stats3['messages_exist'] == [{'num_messages_exist': 7, 'time_stamp': time_stamp}]
+    assert_history(dreams_stats3['channels_exist'], 'num_channels_exist', 5, time_stamp)
+    assert_history(dreams_stats3['dms_exist'], 'num_dms_exist', 5, time_stamp)
+    assert_history(dreams_stats3['messages_exist'], 'num_messages_exist', 7, time_stamp)
     assert dreams_stats3['utilization_rate'] == 0.4
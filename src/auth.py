@@ -2,18 +2,20 @@
 # Written by Winston Lin
 
 from src.error import InputError 
-from src.data import retrieve_data
+from src.data import retrieve_data, mark_dirty, email_index, index_user, unique_handle
+from src.records import User
 
 import datetime
+import time
 import jwt
 import hashlib 
 import re
-import itertools
 import uuid
 import random
 import string
 import threading
 import sys
+from collections import OrderedDict
 
 import smtplib, ssl
 from email.mime.text import MIMEText 
@@ -29,6 +31,13 @@ else:
 
 resetPendings = set()
 
+# Verified tokens, token -> (auth_user_id, sessionID, exp), least recently
+# used first. Saves decoding the jwt again on every check of the same token;
+# the session is still looked up each time so logging out takes effect at once
+TOKEN_CACHE_SIZE = 4096
+tokenCache = OrderedDict()
+tokenCacheLock = threading.Lock()
+
 # generates a unique session ID for every login
 def getNewSessionID():
     # global sessionID 
@@ -68,16 +77,14 @@ def auth_login_v1(email, password):
     if auth_email_format(email) == False:
         raise InputError('invalid email format')
     
-    # Checks for existing email and password
-    for key_it in data['users'].keys():
-        data_email = data['users'][key_it]['email']
-        data_password = data['users'][key_it]['password']
-        # Checks for matching email and password
-        if email == data_email and auth_password_hash(password) == data_password:
-            new_sessionID = getNewSessionID()
-
-            data['users'][key_it]['sessions'].append(new_sessionID)
-            return {'auth_user_id' : key_it, 'token' : auth_encode_token(key_it, new_sessionID)}        
+    # Checks for existing email and matching password
+    key_it = email_index.get(email)
+    if key_it is not None and auth_password_hash(password) == data['users'][key_it]['password']:
+        new_sessionID = getNewSessionID()
+
+        data['users'][key_it]['sessions'].add(new_sessionID)
+        mark_dirty('users', key_it)
+        return {'auth_user_id' : key_it, 'token' : auth_encode_token(key_it, new_sessionID)}
     raise InputError('Credentials do not match')
 
 
@@ -111,8 +118,7 @@ def auth_register_v1(email, password, name_first, name_last):
     if auth_email_format(email) == False:
         raise InputError
     # Checks for an already existing email address
-    elif any(email == data['users'][key_it]['email']\
-    for key_it in data['users']):
+    elif email in email_index:
         raise InputError
     # Ensuring password is over 5 characters
     elif len(password) < 6:
@@ -139,29 +145,20 @@ def auth_register_v1(email, password, name_first, name_last):
 
     new_sessionID = getNewSessionID()
 
-    data['users'][new_auth_user_id] = {
-        'name_first' : name_first, 
-        'name_last' : name_last, 
-        'email' : email,
-        'password' : auth_password_hash(password),
-        'handle_str' : '',
-        'permission_id': permission_id,
-        'sessions' : [new_sessionID],
-        'is_removed': False,
-        'dms': [],
-        'notifications': [],
-    }
+    # If the handle already exists, append with a number starting from 0
+    data['users'][new_auth_user_id] = User(
+        name_first,
+        name_last,
+        email,
+        auth_password_hash(password),
+        handle_str=unique_handle(new_handle),
+        permission_id=permission_id,
+        sessions=[new_sessionID],
+    )
+    index_user(new_auth_user_id)
+    mark_dirty('users', new_auth_user_id)
 
-    # Check to see if the handle is unique
-    if any(new_handle == data['users'][user]['handle_str'] for user in data['users']):
-        # If the handle already exists, append with a number starting from 0
-        for epilogue in itertools.count(0, 1):
-            if(not any((new_handle + str(epilogue)) == data['users'][user]['handle_str'] for user in data['users'])):
-                data['users'][new_auth_user_id]['handle_str'] = new_handle + str(epilogue)
-                return {'auth_user_id' : new_auth_user_id, 'token' : auth_encode_token(new_auth_user_id, new_sessionID)}
-    else:   # unique handle, add straght away 
-        data['users'][new_auth_user_id]['handle_str'] = new_handle
-        return {'auth_user_id' : new_auth_user_id, 'token' : auth_encode_token(new_auth_user_id, new_sessionID)}
+    return {'auth_user_id' : new_auth_user_id, 'token' : auth_encode_token(new_auth_user_id, new_sessionID)}
 
 """
 Generate and return an expirable token based on auth_user_id
@@ -184,6 +181,48 @@ def auth_encode_token(auth_user_id, sessionID):
     # except Exception as e: # catch all kinds of exception
     #     return e
 
+"""
+returns (auth_user_id, sessionID) of a token with a valid signature that hasn't
+expired, or None. Only decodes tokens missing from tokenCache
+"""
+def auth_verify_token(token):
+    with tokenCacheLock:
+        try:
+            cached = tokenCache.get(token)
+        except TypeError:
+            # Unhashable tokens (a list or dict from a json body) are invalid
+            return None
+        if cached is not None:
+            tokenCache.move_to_end(token)
+
+    if cached is None:
+        try:
+            payload = jwt.decode(token, SECRET, algorithms=['HS256'])
+            cached = (payload['auth_user_id'], payload['sessionID'], payload['exp'])
+        except Exception:
+            return None
+        with tokenCacheLock:
+            tokenCache[token] = cached
+            if len(tokenCache) > TOKEN_CACHE_SIZE:
+                tokenCache.popitem(last=False)
+
+    auth_user_id, sessionID, exp = cached
+    if exp <= time.time():
+        auth_forget_token(token)
+        return None
+    return auth_user_id, sessionID
+
+# drop a token from tokenCache
+def auth_forget_token(token):
+    with tokenCacheLock:
+        tokenCache.pop(token, None)
+
+# drop every cached token of a user from tokenCache
+def auth_forget_user_tokens(auth_user_id):
+    with tokenCacheLock:
+        for token in [token for token, cached in tokenCache.items() if cached[0] == auth_user_id]:
+            del tokenCache[token]
+
 """
 returns auth_user_id for others to use 
 """
@@ -191,11 +230,12 @@ def auth_decode_token(token):
 
     data = retrieve_data()
 
-    try:
-        payload = jwt.decode(token, SECRET, algorithms=['HS256'])
-        auth_user_id = payload['auth_user_id']
-        sessionID = payload['sessionID'] 
+    verified = auth_verify_token(token)
+    if verified is None:
+        return False
+    auth_user_id, sessionID = verified
 
+    try:
         if sessionID not in data['users'][auth_user_id]['sessions']:
            return False
 
@@ -216,7 +256,7 @@ def auth_token_ok(token):
 # retrieves the sessionID embedded in the token, only used in auth_logout_v1, other modules don't need to use this
 def auth_get_token_session(token):
     if auth_token_ok(token):
-        return jwt.decode(token, SECRET, algorithms=['HS256'])['sessionID']
+        return auth_verify_token(token)[1]
     else:
         return False
 
@@ -248,6 +288,8 @@ def auth_logout_v1(token):
         auth_user_id = auth_decode_token(token)
         sessionID = auth_get_token_session(token)
         data['users'][auth_user_id]['sessions'].remove(sessionID)
+        mark_dirty('users', auth_user_id)
+        auth_forget_token(token)
 
         responseObj = {'is_success':True}
         return responseObj
@@ -277,7 +319,7 @@ def auth_passwordreset_request(email):
     data = retrieve_data()
 
     # only send email if the email provided is legit
-    if not any(x['email'] == email for x in data['users'].values()):
+    if email not in email_index:
         return
 
     # random verification code 
@@ -361,8 +403,11 @@ def auth_passwordreset_reset(reset_code, new_password):
     elif len(new_password) < 6:
         raise InputError
 
-    targetUser = next(x for x in data['users'].values() if x['email'] == user[0])    
-    #targetUser = filter(lambda x: x['email'] == user[0], data['users'].values())
+    targetID = email_index.get(user[0])
+    if targetID is None:
+        raise InputError
 
-    targetUser['password'] = auth_password_hash(new_password)
+    data['users'][targetID]['password'] = auth_password_hash(new_password)
+    mark_dirty('users', targetID)
+    auth_forget_user_tokens(targetID)
     resetPendings.remove(user)
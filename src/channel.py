@@ -1,27 +1,11 @@
 # PROJECT-BACKEND: Team Echo
 # Written by Kellen (everything else), Brendan Ye (channel_messages), Darrell (channel_invite, channel_details, channel_leave)
 
-from src.data import retrieve_data
+from src.data import retrieve_data, mark_dirty, notify, get_message_page, add_member, remove_member
+from src.records import Notification
 from src.error import AccessError, InputError
 from src.auth import auth_token_ok, auth_decode_token
 
-###############################################################################
-#                               HELPER FUNCTIONS                              #
-###############################################################################
-
-# A function to check whether a message with given message_id is removed
-def is_message_removed(msg_id):
-    data = retrieve_data()
-    count = 0
-    while count < len(data['messages']):
-        if data['messages'][count]['message_id'] == msg_id:
-            if data['messages'][count]['is_removed']:
-                return True
-        count += 1
-    return False
-
-###############################################################################
-
 def channel_invite_v2(token, channel_id, u_id):
     '''
     BRIEF DESCRIPTION
@@ -65,19 +49,19 @@ def channel_invite_v2(token, channel_id, u_id):
     # Assume no inviting themselves
     # Assume inviting people outside channel only
     # if not any(user == u_id for user in data['channels'][channel_id]['all_members']):
+    # add_member doesn't save the channel if u_id is already a member, so the
+    # new owner is saved here
     if data['users'][u_id]['permission_id'] == 1:
         data['channels'][channel_id]['owner_members'].append(u_id)
-    data['channels'][channel_id]['all_members'].append(u_id)
+        mark_dirty('channels', channel_id)
+    add_member('channels', channel_id, u_id)
 
     # Create notification for added user
-    data['users'][u_id]['notifications'].append({
-        'channel_id' : channel_id,
-        'dm_id' : -1,
-        'notification_message' : (str(data['users'][auth_user_id]['handle_str']) + " added you to " + str(data['channels'][channel_id]['name']))
-    })
-    # Make sure notification list is len 20
-    if len(data['users'][u_id]['notifications']) > 20:
-        data['users'][u_id]['notifications'].pop(0)
+    notify(u_id, Notification(
+        channel_id=channel_id,
+        dm_id=-1,
+        notification_message=(str(data['users'][auth_user_id]['handle_str']) + " added you to " + str(data['channels'][channel_id]['name']))
+    ))
 
     return {}
 
@@ -218,29 +202,11 @@ def channel_messages_v2(token, channel_id, start):
         'end': 0
     }
 
-    # Get our current channel
-    channel = data['channels'][channel_id]
     # ASSUMPTION: messages are APPENDED to our message list within the channel
     # key of our data dictionary
-    # Reverse the order of the channel messages so the most recent message
-    # appears in index 0 and the least recent in the last index
-    messages_list = channel['messages'][::-1]
-
-
-    # Loop through our list and return up to 50 of the most recent messages
-    # starting our index with the given start
-    count = 0
-    for message in messages_list:
-        # Check to see if the message has been removed and if it has then
-        # skip it
-        if is_message_removed(message['message_id']):
-            continue
-        
-        # Starting off at the start index, add up to 50 messages to the list
-        # in the messages dictionary
-        if count >= start and count < (start + 50):
-            messages_dict['messages'].append(message)
-        count += 1
+    # Seek straight to the positions of up to 50 of the most recent messages
+    # that haven't been removed, starting our index with the given start
+    messages_dict['messages'] = get_message_page('channels', channel_id, start)
 
     # If 50 messages were added, then the most recent message is going to be
     # returned and as per the spec, 'end' should return -1. Otherwise, end
@@ -285,7 +251,7 @@ def channel_leave_v1(token, channel_id):
     # auth_user is a member, proceed with removal
     else:
         # Remove user ID from all_members
-        data['channels'][channel_id]['all_members'].remove(user_id)
+        remove_member('channels', channel_id, user_id)
         # Remove in owner_members if applicable as well
         if user_id in data['channels'][channel_id]['owner_members']:
             data['channels'][channel_id]['owner_members'].remove(user_id)
@@ -310,7 +276,7 @@ def channel_join_v1(auth_user_id, channel_id):
                 data['channels'][channel_id]['owner_members'].append(auth_user_id)
             
             # Add user to all_members pool in channel
-            data['channels'][channel_id]['all_members'].append(auth_user_id)
+            add_member('channels', channel_id, auth_user_id)
         else: raise AccessError
 
     return {}
@@ -367,19 +333,17 @@ def channel_addowner_v1(token, channel_id, u_id):
 
     # All error checks passed, continue on to add owner
     data['channels'][channel_id]['owner_members'].append(u_id)
+    mark_dirty('channels', channel_id)
     # If not already in server, add on to all members
     if (u_id not in data['channels'][channel_id]['all_members']):
-        data['channels'][channel_id]['all_members'].append(u_id)
+        add_member('channels', channel_id, u_id)
     
         # Create notification for added user
-        data['users'][u_id]['notifications'].append({
-            'channel_id' : channel_id,
-            'dm_id' : -1,
-            'notification_message' : (str(data['users'][user_id]['handle_str']) + " added you to " + str(data['channels'][channel_id]['name']))
-        })
-        # Make sure notification list is len 20
-        if len(data['users'][u_id]['notifications']) > 19:
-            data['users'][u_id]['notifications'].pop(0)
+        notify(u_id, Notification(
+            channel_id=channel_id,
+            dm_id=-1,
+            notification_message=(str(data['users'][user_id]['handle_str']) + " added you to " + str(data['channels'][channel_id]['name']))
+        ))
 
     return {
     }
@@ -421,6 +385,7 @@ def channel_removeowner_v1(token, channel_id, u_id):
 
     # All error checks passed, continue on to remove owner
     data['channels'][channel_id]['owner_members'].remove(u_id)
+    mark_dirty('channels', channel_id)
 
     return {
     }
@@ -1,7 +1,8 @@
 # PROJECT-BACKEND: Team Echo
 # Written by Nikki Yao (channels_listall, channels_create), Kellen (channels_list)
 
-from src.data import retrieve_data
+from src.data import retrieve_data, add_container, user_memberships
+from src.records import Channel
 import uuid
 
 from src.error import InputError, AccessError
@@ -15,20 +16,16 @@ def channels_list_v1(auth_user_id):
 
     # No parameter errors
     # List of channels
-    channel_ids = data['channels']
     channel_list = []
 
-    # Search through individual channels for specific user
-    # Go through each channel
-    for channel in channel_ids:
-        for member in data['channels'][channel]['all_members']:
-            if member == auth_user_id:
-                # Create a list of channel attributes
-                channel_details = {
-                    'channel_id' : channel,
-                    'name' : data['channels'][channel]['name'],
-                }
-                channel_list.append(channel_details)
+    # Go through each channel the user is a member of
+    for channel in user_memberships('channels', auth_user_id):
+        # Create a list of channel attributes
+        channel_details = {
+            'channel_id' : channel,
+            'name' : data['channels'][channel]['name'],
+        }
+        channel_list.append(channel_details)
     
     return{
         'channels': channel_list
@@ -121,17 +118,7 @@ def channels_create_v2(token, name, is_public):
     channel_id = int(uuid.uuid4()) >> 100 # avoid overflow
 
     # Add new channel to channels data
-    data['channels'][channel_id] = {
-        'name' : name, 
-        'is_public' : is_public, 
-        'owner_members': [auth_user_id],
-        'all_members': [auth_user_id],
-        'messages' : [],
-        'standup' : {
-            'is_active' : False,
-            'time_finish' : None,
-        },
-    } 
+    add_container('channels', channel_id, Channel(name, is_public, [auth_user_id], [auth_user_id]))
 
     return {
         'channel_id': channel_id
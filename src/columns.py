@@ -0,0 +1,43 @@
+# PROJECT-BACKEND: Team Echo
+
+'''
+Columnar copy of the message fields read by the aggregate functions
+(users/stats).
+
+Each field is an array.array column indexed by the message's row, which is its
+position in data['messages'], and the number of messages which haven't been
+removed is kept as they are removed. The per user counts of user/stats are
+kept by src/data.py and search has its own index (src/search.py), both of
+which answer without scanning a column.
+'''
+
+from array import array
+
+class MessageColumns:
+    def __init__(self, messages=()):
+        self.is_removed = array('b')
+        # message_id -> row of the message
+        self.rows = {}
+        # Number of rows whose message has been removed
+        self.removed = 0
+
+        for message in messages:
+            self.append(message)
+
+    def __len__(self):
+        return len(self.is_removed)
+
+    def append(self, message):
+        self.rows[message.message_id] = len(self.is_removed)
+        self.is_removed.append(message.is_removed)
+        self.removed += bool(message.is_removed)
+
+    def remove(self, message_id):
+        row = self.rows[message_id]
+        if not self.is_removed[row]:
+            self.is_removed[row] = True
+            self.removed += 1
+
+    # Number of messages which haven't been removed
+    def count_live(self):
+        return len(self) - self.removed
@@ -1,3 +1,18 @@
 port = 8080
 
 url = f"http://localhost:{port}/"
+storage_engine = "journal"
+# Keep a columnar copy of the messages for stats (src/columns.py)
+columnar_messages = True
+# The background flusher writes changes out every flush_interval milliseconds,
+# or sooner once flush_threshold entities have changed (src/data.py)
+flush_interval = 100
+flush_threshold = 500
+# Each channel and dm keeps the text of its message_tail most recent messages
+# in memory, older text moves to segments of segment_size messages of which
+# resident_segments are cached (src/segments.py)
+message_tail = 100
+segment_size = 100
+resident_segments = 32
+# Users keep their notification_capacity most recent notifications
+notification_capacity = 20
@@ -1,6 +1,19 @@
 # PROJECT-BACKEND: Team Echo
 
-import json
+from src import config
+from src.storage import create_storage, empty_data
+from src.columns import MessageColumns
+from src.search import TrigramIndex
+from src.segments import SegmentStore
+from src.scheduler import Scheduler
+from src.records import Job, Message, Totals
+from uuid import uuid4
+from datetime import datetime
+import bisect
+import itertools
+import re
+import threading
+import traceback
 
 # Iteration 1 test data
 data = {
@@ -208,29 +221,566 @@ data = {
             ],
         },
     ],
+    'jobs' : {},
 }
 
 def retrieve_data():
     global data
     return data
 
+# The engine that persists the store, see src/storage.py
+storage = create_storage(config.storage_engine)
+
+# (table, key) pairs changed since the last write_data(), in the order they
+# were first changed. Tables are 'users', 'channels', 'dms' and 'jobs' (keyed
+# by their ids) and 'messages' (keyed by message_id)
+dirty = {}
+dirty_lock = threading.Lock()
+# Wakes the background flusher once enough entities are dirty
+dirty_changed = threading.Condition(dirty_lock)
+# Held while the store is changed, by the server for each request
+# (src/server.py) and by the scheduler for each job. Records are built under
+# it so they never catch an entity in the middle of a change
+store_lock = threading.RLock()
+
+def mark_dirty(table, key):
+    with dirty_lock:
+        dirty[(table, key)] = True
+        if len(dirty) >= config.flush_threshold:
+            dirty_changed.notify()
+
+# mark_dirty() every key of table at once
+def mark_all_dirty(table, keys):
+    with dirty_lock:
+        for key in keys:
+            dirty[(table, key)] = True
+        if len(dirty) >= config.flush_threshold:
+            dirty_changed.notify()
+
+# Swap the storage engine, used by tests and by the server at startup
+def set_storage(engine):
+    global storage
+    storage = create_storage(engine)
+
+# Build the records for every dirty entity. A value of None means the entity
+# was deleted
+def dirty_records():
+    records = []
+    for table, key in dirty:
+        if table == 'messages':
+            record = message_index.get(key)
+        else:
+            record = data[table].get(key)
+        value = record.to_record() if record is not None else None
+        records.append({'table': table, 'key': key, 'value': value})
+    dirty.clear()
+    return records
+
+# Mark the entities of records dirty again, ahead of those changed since
+def restore_dirty(records):
+    with dirty_lock:
+        changed = dict(dirty)
+        dirty.clear()
+        dirty.update(((record['table'], record['key']), True) for record in records)
+        dirty.update(changed)
+
+###############################################################################
+#                                   INDEXES                                   #
+###############################################################################
+
+# message_id -> the message's record in data['messages']
+message_index = {}
+# message_id -> position of the message in its channel or dm
+message_positions = {}
+# (table, channel_id/dm_id) -> ascending positions of the messages in that
+# channel or dm which haven't been removed
+live_positions = {}
+# Number of messages in data['messages'] which haven't been removed
+live_messages = 0
+# Columnar copy of data['messages'] for the aggregate functions, None unless
+# config.columnar_messages is set
+message_columns = None
+# Trigram index of the text of every message that hasn't been removed, see
+# src/search.py
+message_search = TrigramIndex()
+# Text of the old messages of each channel and dm, see src/segments.py
+segments = SegmentStore(config.resident_segments)
+# (table, channel_id/dm_id) -> number of the oldest messages of that channel
+# or dm whose text is in segments
+frozen_messages = {}
+
+def index_messages():
+    global live_messages, message_columns, message_search
+    message_columns = MessageColumns(data['messages']) if config.columnar_messages else None
+    message_search = TrigramIndex(data['messages'])
+    message_index.clear()
+    message_positions.clear()
+    live_positions.clear()
+    live_messages = 0
+    for message in data['messages']:
+        message_index[message['message_id']] = message
+        if not message.is_removed:
+            live_messages += 1
+    for table in ('channels', 'dms'):
+        for key, container in data[table].items():
+            live = live_positions[(table, key)] = []
+            for position, message in enumerate(container['messages']):
+                message_positions[message['message_id']] = position
+                if not message_index[message['message_id']].is_removed:
+                    live.append(position)
+
+    # Move the text of old messages out. The ones still frozen in a binary
+    # snapshot's mapping (src/storage.py) are already out of memory, segments
+    # start after the last of them
+    segments.clear()
+    frozen_messages.clear()
+    for table in ('channels', 'dms'):
+        for key, container in data[table].items():
+            mapped = [position for position, message in enumerate(container['messages'])
+                      if message.frozen is not None]
+            if mapped:
+                frozen_messages[(table, key)] = mapped[-1] + 1
+            freeze_messages(table, key)
+
+# Store a new message and add it to the end of its channel or dm
+def add_message(message):
+    global live_messages
+    if message.channel_id != -1:
+        table, key = 'channels', message.channel_id
+    else:
+        table, key = 'dms', message.dm_id
+    container = data[table][key]
+
+    message_index[message['message_id']] = message
+    message_positions[message['message_id']] = len(container['messages'])
+    live_positions.setdefault((table, key), []).append(len(container['messages']))
+    container['messages'].append(message)
+    data['messages'].append(message)
+    live_messages += 1
+    if message_columns is not None:
+        message_columns.append(message)
+    message_search.add(message)
+    author_messages.setdefault(message.u_id, []).append(message)
+    freeze_messages(table, key)
+
+    mark_dirty('messages', message['message_id'])
+    record_totals()
+
+# Move the text of a channel's or dm's old messages into segments, a segment
+# at a time, keeping the config.message_tail most recent in memory
+def freeze_messages(table, key):
+    messages = data[table][key]['messages']
+    frozen = frozen_messages.get((table, key), 0)
+    while len(messages) - frozen >= config.message_tail + config.segment_size:
+        segments.freeze(f"{table}-{key}-{frozen // config.segment_size}",
+                        messages[frozen:frozen + config.segment_size])
+        frozen += config.segment_size
+    frozen_messages[(table, key)] = frozen
+
+# Flag a message as removed and drop it from its container's live positions
+def remove_message(message_id):
+    global live_messages
+    message = message_index[message_id]
+    if not message.is_removed:
+        live_messages -= 1
+    message.is_removed = True
+    if message_columns is not None:
+        message_columns.remove(message_id)
+    message_search.discard(message)
+    if message.channel_id != -1:
+        live = live_positions.get(('channels', message.channel_id), [])
+    else:
+        live = live_positions.get(('dms', message.dm_id), [])
+    position = bisect.bisect_left(live, message_positions[message_id])
+    if position < len(live) and live[position] == message_positions[message_id]:
+        del live[position]
+    mark_dirty('messages', message_id)
+    record_totals()
+
+# email -> u_id and handle_str -> u_id of every user who hasn't been removed
+email_index = {}
+handle_index = {}
+# handle -> the lowest number that may be free to append to it when it's taken
+handle_suffixes = {}
+
+def index_users():
+    email_index.clear()
+    handle_index.clear()
+    handle_suffixes.clear()
+    Message.removed_authors.clear()
+    for u_id in data['users']:
+        if data['users'][u_id]['is_removed']:
+            Message.removed_authors.add(u_id)
+        else:
+            index_user(u_id)
+
+def index_user(u_id):
+    email_index[data['users'][u_id]['email']] = u_id
+    handle_index[data['users'][u_id]['handle_str']] = u_id
+
+# Free a removed user's email and handle
+def unindex_user(u_id):
+    user = data['users'][u_id]
+    if email_index.get(user['email']) == u_id:
+        del email_index[user['email']]
+    if handle_index.get(user['handle_str']) == u_id:
+        del handle_index[user['handle_str']]
+        release_handle(user['handle_str'])
+
+# Remove a user from Dreams. Their messages read as Message.removed_text from
+# now on without being rewritten
+def tombstone_user(u_id):
+    data['users'][u_id]['is_removed'] = True
+    unindex_user(u_id)
+    Message.removed_authors.add(u_id)
+    mark_dirty('users', u_id)
+
+def set_user_email(u_id, email):
+    unindex_user(u_id)
+    data['users'][u_id]['email'] = email
+    index_user(u_id)
+    mark_dirty('users', u_id)
+
+def set_user_handle(u_id, handle_str):
+    unindex_user(u_id)
+    data['users'][u_id]['handle_str'] = handle_str
+    index_user(u_id)
+    mark_dirty('users', u_id)
+
+# Give u_id a notification. Only their config.notification_capacity most
+# recent are kept, see Notifications in src/records.py
+def notify(u_id, notification):
+    notify_all((u_id,), notification)
+
+# Give each of u_ids the same notification
+def notify_all(u_ids, notification):
+    for u_id in u_ids:
+        data['users'][u_id]['notifications'].append(notification)
+    mark_all_dirty('users', u_ids)
+
+# A freed handle may be a number appended to another, in which case
+# unique_handle must try that number again
+def release_handle(handle_str):
+    for end in range(len(handle_str) - 1, 0, -1):
+        base, suffix = handle_str[:end], handle_str[end:]
+        if not suffix.isdigit():
+            break
+        if str(int(suffix)) == suffix and handle_suffixes.get(base, 0) > int(suffix):
+            handle_suffixes[base] = int(suffix)
+
+# Return handle if nobody has it, otherwise handle with the lowest number
+# appended that nobody has, counting on from the lowest that may be free
+def unique_handle(handle):
+    if handle not in handle_index:
+        return handle
+    suffix = handle_suffixes.get(handle, 0)
+    while handle + str(suffix) in handle_index:
+        suffix += 1
+    handle_suffixes[handle] = suffix + 1
+    return handle + str(suffix)
+
+# Replace the text of a message
+def edit_message(message_id, text):
+    message = message_index[message_id]
+    old_text, message.message = message.sent_message, text
+    message_search.update(message, old_text)
+    mark_dirty('messages', message_id)
+
+# Return up to 50 messages of a channel or dm, most recent first, skipping
+# removed messages. Index 0 is the most recent message
+def get_message_page(table, key, start):
+    live = live_positions.get((table, key), [])
+    messages = data[table][key]['messages']
+    if start >= len(live):
+        return []
+    window = live[max(0, len(live) - start - 50):len(live) - start]
+    return [messages[position] for position in reversed(window)]
+
+# Given a message_id, return its record or None if there is no such message
+def get_message_record(message_id):
+    try:
+        return message_index.get(message_id)
+    except TypeError:
+        # Unhashable ids can't refer to any message
+        return None
+
+# Number of messages u_id has sent, including removed ones
+def count_messages_sent_by(u_id):
+    return len(author_messages.get(u_id, ()))
+
+# Messages which haven't been removed whose text contains query_str, in the
+# order they were sent
+def search_messages(query_str):
+    results = message_search.search(query_str)
+    if not Message.removed_authors or query_str not in Message.removed_text:
+        return results
+
+    # Messages of removed users read as Message.removed_text but are indexed
+    # under the text they were sent with
+    found = {message.message_id for message in results}
+    for u_id in Message.removed_authors:
+        for message in author_messages.get(u_id, ()):
+            if message.message_id in message_search.messages and message.message_id not in found:
+                results.append(message)
+    results.sort(key=lambda message: message_search.sequence[message.message_id])
+    return results
+
+###############################################################################
+#                                   MEMBERS                                   #
+###############################################################################
+
+# The list of members of a channel or dm
+MEMBERS = {'channels': 'all_members', 'dms': 'members'}
+
+# table -> u_id -> ids of the channels or dms the user is a member of, as
+# the keys of a dictionary
+memberships = {'channels': {}, 'dms': {}}
+# (table, channel_id/dm_id) -> number giving the order channels and dms were
+# created in
+created = {}
+creation_order = itertools.count()
+# u_id -> messages the user has sent (including removed ones) in the order
+# they were sent, for user/stats and search
+author_messages = {}
+# Users who are a member of at least one channel or dm, for users/stats
+involved_users = set()
+
+def index_members():
+    for table in MEMBERS:
+        memberships[table].clear()
+    created.clear()
+    author_messages.clear()
+    involved_users.clear()
+    for table in MEMBERS:
+        for key, container in data[table].items():
+            index_container(table, key, container)
+    for message in data['messages']:
+        author_messages.setdefault(message.u_id, []).append(message)
+
+def index_container(table, key, container):
+    created[(table, key)] = next(creation_order)
+    for u_id in container[MEMBERS[table]]:
+        index_member(table, key, u_id)
+
+def index_member(table, key, u_id):
+    memberships[table].setdefault(u_id, {})[key] = None
+    involved_users.add(u_id)
+
+def unindex_member(table, key, u_id):
+    keys = memberships[table].get(u_id, {})
+    keys.pop(key, None)
+    if not keys:
+        memberships[table].pop(u_id, None)
+        if all(u_id not in memberships[other] for other in MEMBERS):
+            involved_users.discard(u_id)
+
+# channel_ids or dm_ids of the channels or dms u_id is a member of, in the
+# order they were created
+def user_memberships(table, u_id):
+    return sorted(memberships[table].get(u_id, {}), key=lambda key: created[(table, key)])
+
+def count_memberships(table, u_id):
+    return len(memberships[table].get(u_id, {}))
+
+# (channel_id, dm_id) of every channel and dm u_id is a member of, using -1
+# for the one that doesn't apply like messages do
+def user_containers(u_id):
+    containers = {(channel_id, -1) for channel_id in memberships['channels'].get(u_id, {})}
+    containers.update((-1, dm_id) for dm_id in memberships['dms'].get(u_id, {}))
+    return containers
+
+# An @ followed by a handle
+MENTION = re.compile(r"@([a-zA-Z0-9]+)")
+
+# Members of a channel or dm mentioned in text, each once in the order they
+# were first mentioned
+def find_mentions(table, key, text):
+    members = data[table][key][MEMBERS[table]]
+    mentioned = {}
+    for handle in MENTION.findall(text):
+        u_id = handle_index.get(handle)
+        if u_id is not None and u_id in members:
+            mentioned[u_id] = None
+    return list(mentioned)
+
+# Store a new channel or dm along with its members
+def add_container(table, key, container):
+    data[table][key] = container
+    index_container(table, key, container)
+    mark_dirty(table, key)
+    record_totals()
+
+# Delete a channel or dm, its members leave it
+def remove_container(table, key):
+    container = data[table].pop(key)
+    for u_id in container[MEMBERS[table]]:
+        unindex_member(table, key, u_id)
+    del created[(table, key)]
+    mark_dirty(table, key)
+    record_totals()
+
+def add_member(table, key, u_id):
+    members = data[table][key][MEMBERS[table]]
+    if u_id in members:
+        return
+    members.append(u_id)
+    index_member(table, key, u_id)
+    mark_dirty(table, key)
+
+def remove_member(table, key, u_id):
+    data[table][key][MEMBERS[table]].remove(u_id)
+    unindex_member(table, key, u_id)
+    mark_dirty(table, key)
+
+###############################################################################
+#                                    STATS                                    #
+###############################################################################
+
+# Number of messages which haven't been removed
+def count_live_messages():
+    if message_columns is not None:
+        return message_columns.count_live()
+    return live_messages
+
+# Append the workspace totals to the history in data['stats'] (position ->
+# Totals, oldest first) if they changed since its last point. Called whenever
+# a channel or dm is created or removed and a message is sent or removed
+def record_totals():
+    stats = data['stats']
+    totals = (len(data['channels']), len(data['dms']), count_live_messages())
+    if stats:
+        last = stats[len(stats) - 1]
+        if (last.num_channels_exist, last.num_dms_exist, last.num_messages_exist) == totals:
+            return
+    stats[len(stats)] = Totals(round(datetime.now().timestamp()), *totals)
+    mark_dirty('stats', len(stats) - 1)
+
+# The points of the history at which field changed, as users/stats lists them
+def totals_history(field):
+    history, last = [], None
+    for totals in data['stats'].values():
+        if totals[field] != last:
+            history.append({field: totals[field], 'time_stamp': totals.time_stamp})
+            last = totals[field]
+    return history
+
+###############################################################################
+#                                    JOBS                                     #
+###############################################################################
+
+# kind -> function called with a job's args once the job is due
+job_handlers = {}
+
+def register_job(kind, handler):
+    job_handlers[kind] = handler
+
+# Run handler(**args) for the job's kind at the unix time when. The job is
+# kept in data['jobs'] until then, so it survives a restart
+def schedule_job(kind, when, args):
+    job_id = int(uuid4()) >> 100
+    data['jobs'][job_id] = Job(kind, when, args)
+    mark_dirty('jobs', job_id)
+    scheduler.schedule(job_id, when)
+    return job_id
+
+def run_job(job_id):
+    with store_lock:
+        # The job is gone if the store was cleared or reloaded since
+        job = data['jobs'].pop(job_id, None)
+        if job is None:
+            return
+        mark_dirty('jobs', job_id)
+        job_handlers[job['kind']](**job['args'])
+
+scheduler = Scheduler(run_job)
+
+def schedule_jobs():
+    scheduler.reset()
+    for job_id, job in data['jobs'].items():
+        scheduler.schedule(job_id, job['time'])
+
 def read_data():
     global data
-    try:
-        with open("data.json", "r") as FILE:
-            data_json = json.load(FILE)
-            data = data_json
-    except:
-        data = {
-            "users" : {},
-            "channels" : {},
-            "dms" : {},
-            "messages" : []
-        }
-        with open("data.json", "w") as FILE:
-            json.dump(data, FILE)
+    data = storage.load()
+    index_messages()
+    index_users()
+    index_members()
+    schedule_jobs()
+    # The history starts with the workspace, or with the first load of a
+    # store from before it was kept
+    record_totals()
 
+# Held while a batch of records is written. Requests finishing during a write
+# wait here, and the first to get in writes every record changed meanwhile, so
+# a burst of requests is written in a couple of batches rather than one each
+flush_lock = threading.Lock()
+
+# Persist every entity changed since the last write, does nothing if nothing
+# changed
 def write_data():
-    data = retrieve_data()
-    with open("data.json", "w") as FILE:
-        json.dump(data, FILE)
\ No newline at end of file
+    with flush_lock:
+        with store_lock, dirty_lock:
+            records = dirty_records()
+        if not records:
+            return
+        try:
+            storage.save(records, data)
+        except Exception:
+            # Keep the batch, it is written along with the next one
+            restore_dirty(records)
+            raise
+
+# Write out every change and wait for the storage engine to get it onto the
+# disk, for shutdown and for tests
+def sync_data():
+    write_data()
+    storage.sync()
+
+# The server doesn't write changes out while answering a request. The flusher
+# thread writes them every config.flush_interval milliseconds, or as soon as
+# config.flush_threshold entities are dirty, whichever comes first
+flusher = None
+
+def start_flusher():
+    global flusher
+    if flusher is None:
+        flusher = threading.Thread(target=flush_loop, daemon=True)
+        flusher.start()
+
+# Stop the flusher once it has written what is dirty
+def stop_flusher():
+    global flusher
+    thread, flusher = flusher, None
+    if thread is not None:
+        with dirty_lock:
+            dirty_changed.notify()
+        thread.join()
+
+def flush_loop():
+    thread = threading.current_thread()
+    while flusher is thread:
+        with dirty_lock:
+            dirty_changed.wait_for(lambda: flusher is not thread or len(dirty) >= config.flush_threshold,
+                                   config.flush_interval / 1000)
+        # A failed write is retried next time, the flusher mustn't die with it
+        try:
+            write_data()
+        except Exception:
+            traceback.print_exc()
+
+# Write out the whole store at once
+def snapshot_data():
+    storage.snapshot(data)
+
+# Reset the store to an empty workspace, both in memory and on disk
+def clear_data():
+    global data
+    with dirty_lock:
+        data = empty_data()
+        dirty.clear()
+    index_messages()
+    index_users()
+    index_members()
+    schedule_jobs()
+    record_totals()
+    storage.clear(data)
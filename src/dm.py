@@ -1,7 +1,8 @@
 # PROJECT-BACKEND: Team Echo
 # Written by Darrell Mounarath (dm_create, dm_details, dm_list, dm_remove, dm_invite, dm_leave), Brendan Ye (dm_messages)
 
-from src.data import retrieve_data
+from src.data import retrieve_data, notify, notify_all, get_message_page, user_memberships, add_container, remove_container, add_member, remove_member
+from src.records import Dm, Notification
 from src.error import AccessError, InputError
 from src.auth import auth_token_ok, auth_decode_token
 
@@ -44,25 +45,15 @@ def dm_create_v1(token, u_ids):
 
     dm_id = int(uuid.uuid4()) >> 100
     # Add new dm to dms data
-    data['dms'][dm_id] = {
-        'name': dm_name,
-        'members': u_ids,
-        'messages': []
-    }
+    add_container('dms', dm_id, Dm(dm_name, u_ids))
 
     # Create notification for users added to dm's
-    notification = {
-        'channel_id' : -1,
-        'dm_id' : dm_id,
-        'notification_message' : (str(data['users'][auth_user_id]['handle_str']) + " added you to " + dm_name)
-    }
-    for u_id in u_ids:
-        # Make sure notification list is len 20
-        if len(data['users'][u_id]['notifications']) > 19:
-            data['users'][u_id]['notifications'].pop(0)
-        
-        # Append new notification to end of list
-        data['users'][u_id]['notifications'].append(notification)
+    notification = Notification(
+        channel_id=-1,
+        dm_id=dm_id,
+        notification_message=(str(data['users'][auth_user_id]['handle_str']) + " added you to " + dm_name)
+    )
+    notify_all(u_ids, notification)
 
 
     return {'dm_id': dm_id, 'dm_name': dm_name}
@@ -143,13 +134,12 @@ def dm_list_v1(token):
     dm_list = []
 
     # Make dict to append to dm_list
-    for dm in data['dms']:
-        if auth_user_id in data['dms'][dm]['members']:
-            dm_dict = {
-                'dm_id': dm,
-                'name': data['dms'][dm]['name']
-            }
-            dm_list.append(dm_dict)
+    for dm in user_memberships('dms', auth_user_id):
+        dm_dict = {
+            'dm_id': dm,
+            'name': data['dms'][dm]['name']
+        }
+        dm_list.append(dm_dict)
 
     return {'dms': dm_list}
 
@@ -180,7 +170,7 @@ def dm_remove_v1(token, dm_id):
     if auth_user_id != data['dms'][dm_id]['members'][0]: raise AccessError
 
     # Deletes dm from data
-    del data['dms'][dm_id]
+    remove_container('dms', dm_id)
 
     return {}
 
@@ -218,19 +208,15 @@ def dm_invite_v1(token, dm_id, u_id):
     # Checks if user belongs in dm
     if auth_user_id not in data['dms'][dm_id]['members']: raise AccessError
 
-    data['dms'][dm_id]['members'].append(u_id)
+    add_member('dms', dm_id, u_id)
 
     # Create notification for added user
-    notification = {
-        'channel_id' : -1,
-        'dm_id' : dm_id,
-        'notification_message' : (str(data['users'][auth_user_id]['handle_str']) + " added you to " + str(data['dms'][dm_id]['name']))
-    }
-    # Make sure notification list is len 20
-    if len(data['users'][u_id]['notifications']) > 19:
-        data['users'][u_id]['notifications'].pop(0)
-    # Append new notification to end of list
-    data['users'][u_id]['notifications'].append(notification)
+    notification = Notification(
+        channel_id=-1,
+        dm_id=dm_id,
+        notification_message=(str(data['users'][auth_user_id]['handle_str']) + " added you to " + str(data['dms'][dm_id]['name']))
+    )
+    notify(u_id, notification)
 
     return {}
 
@@ -263,7 +249,7 @@ def dm_leave_v1(token, dm_id):
     # Checks if user belongs in dm
     if auth_user_id not in data['dms'][dm_id]['members']: raise AccessError
 
-    data['dms'][dm_id]['members'].remove(auth_user_id)
+    remove_member('dms', dm_id, auth_user_id)
 
     return {}
 
@@ -323,29 +309,11 @@ def dm_messages_v1(token, dm_id, start):
         'end': 0
     }
 
-    # Get our current dm
-    dm = data['dms'][dm_id]
     # ASSUMPTION: messages are APPENDED to our message list within the dm
     # key of our data dictionary
-    # Reverse the order of the dm messages so the most recent message
-    # appears in index 0 and the least recent in the last index
-    messages_list = dm['messages'][::-1]
-
-
-    # Loop through our list and return up to 50 of the most recent messages
-    # starting our index with the given start
-    count = 0
-    for message in messages_list:
-        # Check to see if the message has been removed and if it has then
-        # skip it
-        if is_message_removed(message['message_id']):
-            continue
-        
-        # Starting off at the start index, add up to 50 messages to the list
-        # in the messages dictionary
-        if count >= start and count < (start + 50):
-            messages_dict['messages'].append(message)
-        count += 1
+    # Seek straight to the positions of up to 50 of the most recent messages
+    # that haven't been removed, starting our index with the given start
+    messages_dict['messages'] = get_message_page('dms', dm_id, start)
 
     # If 50 messages were added, then the most recent message is going to be
     # returned and as per the spec, 'end' should return -1. Otherwise, end
@@ -360,18 +328,3 @@ def dm_messages_v1(token, dm_id, start):
         messages_dict['end'] = start + 50
 
     return messages_dict
-
-###############################################################################
-#                               HELPER FUNCTIONS                              #
-###############################################################################
-
-# A function to check whether a message with given message_id is removed
-def is_message_removed(msg_id):
-    data = retrieve_data()
-    count = 0
-    while count < len(data['messages']):
-        if data['messages'][count]['message_id'] == msg_id:
-            if data['messages'][count]['is_removed']:
-                return True
-        count += 1
-    return False
@@ -0,0 +1,39 @@
+# PROJECT-BACKEND: Team Echo
+
+'''
+JSON encoding shared by the storage engines (src/storage.py) and the server's
+responses (src/server.py).
+
+orjson is used when it is installed, otherwise the standard library json
+module. Both encoders give the same output, except for floats which may be
+written differently (1e+20 or 1e20) but are read back as the same value:
+
+    dumps(value)    - compact json as utf-8 bytes, text isn't escaped to
+                      ascii. Records, and sets of them, are turned into their
+                      API form (see src/records.py) and dictionary keys that
+                      aren't strings become strings
+    loads(text)     - the value held by json bytes or a json string
+
+Dictionary keys always come back as strings, so integer ids used as keys are
+turned back into integers by whoever decodes them (decode_snapshot() in
+src/storage.py).
+'''
+
+import json
+
+from src.records import to_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value, default=to_json, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=to_json, separators=(',', ':'), ensure_ascii=False).encode()
+
+def loads(text):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
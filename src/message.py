@@ -1,15 +1,13 @@
 # PROJECT-BACKEND: Team Echo
 # Written by Brendan Ye
 
-from src.data import retrieve_data
+from src.data import retrieve_data, mark_dirty, notify, notify_all, find_mentions, add_message, get_message_record, remove_message, edit_message, register_job, schedule_job
+from src.records import Message, React, Notification
 from src.error import AccessError, InputError
 from src.auth import auth_token_ok, auth_decode_token
 from uuid import uuid4
 from datetime import datetime
 import json
-import re
-
-import threading # Used for timer
 
 ###############################################################################
 #                                  FUNCTIONS                                  #
@@ -53,6 +51,13 @@ def message_send_v2(token, channel_id, message):
         raise AccessError(description=\
             "The user corresponding to the given token is not in the channel")
 
+    return message_send_channel_helper(user_id, channel_id, message)
+
+
+# Send a message from user_id to channel_id without checking the user may,
+# used by message_send_v2 and by standups when they finish
+def message_send_channel_helper(user_id, channel_id, message):
+    data = retrieve_data()
 
     # Creating a unique id for our message_id. The chances of uuid4 returning
     # the same time is infinitesimally small.
@@ -62,63 +67,37 @@ def message_send_v2(token, channel_id, message):
     # which is based on unix time (epoch/POSIX time)
     time_created_timestamp = round(datetime.now().timestamp())
 
-    # Create a dictionary which we will append to our messages list in our channel
-    channel_message_dictionary = {
-        'message_id': unique_message_id,
-        'u_id': user_id,
-        'message': message,
-        'time_created': time_created_timestamp,
-        'reacts': [],
-        'is_pinned': False,
-    }
+    # Create the message record which we will append to our data['messages']
+    # list and share with the messages list of our channel
+    message_dictionary = Message(unique_message_id, user_id, message,
+        time_created_timestamp, channel_id=channel_id, dm_id=-1)
 
-    # Create a dictionary which we will append to our data['messages'] list
-    message_dictionary = {
-        'message_id': unique_message_id,
-        'u_id': user_id,
-        'message': message,
-        'time_created': time_created_timestamp,
-        'channel_id': channel_id,
-        'dm_id': -1,
-        'is_removed': False,
-        'was_shared': False,
-        'reacts': [],
-        'is_pinned': False,
-    }
-
-    # Append our dictionaries to their appropriate lists
-    data['channels'][channel_id]['messages'].append(channel_message_dictionary)
-    data['messages'].append(message_dictionary)
+    # Append our dictionary to data['messages'] and the channel
+    add_message(message_dictionary)
     
-    # Create notification if someone is tagged
-    tag = re.search("@[a-zA-Z1-9]*", message)
-    if tag != None:
-        tag = tag.group()
-        tag = tag[1:]
-        tagged = 0
-        
-        # Search for the tagged user within all_members and get their auth_id
-        for member in data['channels'][channel_id]['all_members']:
-            if (tag == data['users'][member]['handle_str']):
-                tagged = member
-
-        if tagged == 0: return {'message_id': unique_message_id}
-        
-        data['users'][tagged]['notifications'].append({
-            'channel_id' : channel_id,
-            'dm_id' : -1,
-            'notification_message' : (str(data['users'][user_id]['handle_str'])
-            + " tagged you in " + str(data['channels'][channel_id]['name'])
-            + ": " + message[0:20])
-        })
-        # Make sure notification list is len 20
-        if len(data['users'][tagged]['notifications']) > 20:
-            data['users'][tagged]['notifications'].pop(0)
+    # Notify everyone tagged in the message
+    notify_mentions(user_id, 'channels', channel_id, message)
 
     return {
         'message_id': unique_message_id
     }
-    
+
+# Notify the members of a channel or dm tagged in a message sent there by user_id
+def notify_mentions(user_id, table, key, message):
+    data = retrieve_data()
+
+    tagged = find_mentions(table, key, message)
+    if not tagged:
+        return
+
+    notify_all(tagged, Notification(
+        channel_id=key if table == 'channels' else -1,
+        dm_id=key if table == 'dms' else -1,
+        notification_message=(str(data['users'][user_id]['handle_str'])
+        + " tagged you in " + str(data[table][key]['name'])
+        + ": " + message[0:20])
+    ))
+
 
 def message_remove_v1(token, message_id):
     '''
@@ -146,11 +125,9 @@ def message_remove_v1(token, message_id):
         raise AccessError("The given token is not valid")
 
     # Check if the message_id given is already deleted
-    for message_dict in data['messages']:
-        if message_dict['message_id'] == message_id:
-            if message_dict['is_removed'] == True:
-                raise InputError(description="Message (based on id) no longer exists")
-    
+    msg = get_message_record(message_id)
+    if msg is not None and msg.is_removed == True:
+        raise InputError(description="Message (based on id) no longer exists")
 
     # Check to see if the user trying to edit the message was the one who sent it
     # or if they are an owner of the channel/dm or dreams
@@ -159,9 +136,7 @@ def message_remove_v1(token, message_id):
         raise AccessError(description=\
             "User is not dreams owner or channel owner and did not send the message")
 
-    for msg in data['messages']:
-        if msg['message_id'] == message_id:
-            msg['is_removed'] = True
+    remove_message(message_id)
 
     return { }
 
@@ -194,10 +169,9 @@ def message_edit_v2(token, message_id, message):
         raise AccessError("The given token is not valid")
 
     # Check if the message_id given is already deleted
-    for message_dict in data['messages']:
-        if message_dict['message_id'] == message_id:
-            if message_dict['is_removed'] == True:
-                raise InputError(description="Message (based on id) no longer exists")
+    msg = get_message_record(message_id)
+    if msg is not None and msg.is_removed == True:
+        raise InputError(description="Message (based on id) no longer exists")
 
     # Check if the message is within the character limits
     if len(message) > 1000:
@@ -215,20 +189,8 @@ def message_edit_v2(token, message_id, message):
     if message == "":
         message_remove_v1(token, message_id)
     
-    # Otherwise, update the message in both data['messages'] and the channel or dm
-    for msg in data['messages']:
-        if msg['message_id'] == message_id:
-            channel_id = msg['channel_id']
-            dms_id = msg['dm_id']
-            msg['message'] = message
-    if channel_id != -1:
-        for ch_msg in data['channels'][channel_id]['messages']:
-            if ch_msg['message_id'] == message_id:
-                ch_msg['message'] = message
-    else:
-        for dm_msg in data['dms'][dms_id]['messages']:
-            if dm_msg['message_id'] == message_id:
-                dm_msg['message'] = message
+    # Otherwise, update the message, which the channel or dm shares
+    edit_message(message_id, message)
 
     return { }
 
@@ -280,11 +242,10 @@ def message_share_v1(token, og_message_id, message, channel_id, dm_id):
 
     if channel_id != -1:
         shared_message_id = message_send_v2(token, channel_id, shared_message)['message_id']
-        data['messages'][len(data['messages']) - 1]['was_shared'] = True
     else:
         shared_message_id = message_senddm_v1(token, dm_id, shared_message)['message_id']
-        data['messages'][len(data['messages']) - 1]['was_shared'] = True
-
+    get_message_record(shared_message_id).was_shared = True
+    mark_dirty('messages', shared_message_id)
 
     return {'shared_message_id': shared_message_id}
 
@@ -333,59 +294,16 @@ def message_senddm_v1(token, dm_id, message):
     # which is based on unix time (epoch/POSIX time)
     time_created_timestamp = round(datetime.now().timestamp())
 
-    # Create a dictionary which we will append to our messages list in our dm
-    dm_message_dictionary = {
-        'message_id': unique_message_id,
-        'u_id': user_id,
-        'message': message,
-        'time_created': time_created_timestamp,
-        'reacts': [],
-        'is_pinned': False,
-    }
-
-    # Create a dictionary which we will append to our data['messages'] list
-    message_dictionary = {
-        'message_id': unique_message_id,
-        'u_id': user_id,
-        'message': message,
-        'time_created': time_created_timestamp,
-        'channel_id': -1,
-        'dm_id': dm_id,
-        'is_removed': False,
-        'was_shared': False,
-        'reacts': [],
-        'is_pinned': False,
-    }
+    # Create the message record which we will append to our data['messages']
+    # list and share with the messages list of our dm
+    message_dictionary = Message(unique_message_id, user_id, message,
+        time_created_timestamp, channel_id=-1, dm_id=dm_id)
 
-    # Append our dictionaries to their appropriate lists
-    data['dms'][dm_id]['messages'].append(dm_message_dictionary)
-    data['messages'].append(message_dictionary)
-
-    # Create notification if someone is tagged
-    tag = re.search("@[a-zA-Z1-9]*", message)
-    if tag != None:
-        tag = tag.group()
-        tag = tag[1:]
-        tagged = 0
-
-        # Search for the tagged user within all_members and get their auth_id
-        for member in data['dms'][dm_id]['members']:
-            if (tag == data['users'][member]['handle_str']):
-                tagged = member
-        
-        notification = {
-            'channel_id' : -1,
-            'dm_id' : dm_id,
-            'notification_message' : (str(data['users'][user_id]['handle_str'])
-            + " tagged you in " + str(data['dms'][dm_id]['name'])
-            + ": " + str(message[0:20]))
-        }
-        # Make sure notification list is len 20
-        if len(data['users'][tagged]['notifications']) == 20:
-            data['users'][tagged]['notifications'].pop(0)
-        # Append new notification to end of list
-        data['users'][tagged]['notifications'].append(notification)
+    # Append our dictionary to data['messages'] and the dm
+    add_message(message_dictionary)
 
+    # Notify everyone tagged in the message
+    notify_mentions(user_id, 'dms', dm_id, message)
 
     return {
         'message_id': unique_message_id
@@ -439,12 +357,13 @@ def message_sendlater_v1(token, channel_id, message, time_sent):
 
     unique_message_id = int(uuid4()) >> 100
 
-    time_until_send = round(time_sent - datetime.now().timestamp())
-
-    # Start a timer which only performs the helper function after time_until_send seconds occur
-    sendlater = threading.Timer(time_until_send, message_sendlater_channel_helper,
-                                args=[user_id, channel_id, unique_message_id, message])
-    sendlater.start()
+    # Schedule the helper function to send the message at time_sent
+    schedule_job('sendlater_channel', time_sent, {
+        'user_id': user_id,
+        'channel_id': channel_id,
+        'unique_message_id': unique_message_id,
+        'message': message,
+    })
 
     return {'message_id': unique_message_id}
 
@@ -452,44 +371,16 @@ def message_sendlater_v1(token, channel_id, message, time_sent):
 def message_sendlater_channel_helper(user_id, channel_id, unique_message_id, message):
     data = retrieve_data()
     
-    message_dictionary = {
-        'message_id': unique_message_id,
-        'u_id': user_id,
-        'message': message,
-        'time_created': round(datetime.now().timestamp()),
-        'channel_id': channel_id,
-        'dm_id': -1,
-        'is_removed': False,
-        'was_shared': False,
-        'reacts': [{
-            'react_id': 1,
-            'u_ids': [],
-            'is_this_user_reacted': False
-        }],
-        'is_pinned': False
-    }
-
-    data['messages'].append(message_dictionary)
+    message_dictionary = Message(unique_message_id, user_id, message,
+        round(datetime.now().timestamp()), channel_id=channel_id, dm_id=-1,
+        reacts=[React(1)])
 
-    channel_message_dictionary = {
-        'message_id': unique_message_id,
-        'u_id': user_id,
-        'message': message,
-        'time_created': round(datetime.now().timestamp()),
-        'reacts': [{
-            'react_id': 1,
-            'u_ids': [],
-            'is_this_user_reacted': False
-        }],
-        'is_pinned': False
-    }
-
-    for msg in data['messages']:
-        if unique_message_id == msg['message_id']:
-            data['channels'][channel_id]['messages'].append(channel_message_dictionary)
+    add_message(message_dictionary)
     
     return {}
 
+register_job('sendlater_channel', message_sendlater_channel_helper)
+
 
 def message_sendlaterdm_v1(token, dm_id, message, time_sent):
     '''
@@ -539,12 +430,13 @@ def message_sendlaterdm_v1(token, dm_id, message, time_sent):
 
     unique_message_id = int(uuid4()) >> 100
 
-    time_until_send = round(time_sent - datetime.now().timestamp())
-
-    # Start a timer which only performs the helper function after time_until_send seconds occur
-    sendlater = threading.Timer(time_until_send, message_sendlater_dm_helper,
-                                args=[user_id, dm_id, unique_message_id, message])
-    sendlater.start()
+    # Schedule the helper function to send the message at time_sent
+    schedule_job('sendlater_dm', time_sent, {
+        'user_id': user_id,
+        'dm_id': dm_id,
+        'unique_message_id': unique_message_id,
+        'message': message,
+    })
 
     return {'message_id': unique_message_id}
 
@@ -552,44 +444,16 @@ def message_sendlaterdm_v1(token, dm_id, message, time_sent):
 def message_sendlater_dm_helper(user_id, dm_id, unique_message_id, message):
     data = retrieve_data()
     
-    message_dictionary = {
-        'message_id': unique_message_id,
-        'u_id': user_id,
-        'message': message,
-        'time_created': round(datetime.now().timestamp()),
-        'channel_id': -1,
-        'dm_id': dm_id,
-        'is_removed': False,
-        'was_shared': False,
-        'reacts': [{
-            'react_id': 1,
-            'u_ids': [],
-            'is_this_user_reacted': False
-        }],
-        'is_pinned': False
-    }
-
-    data['messages'].append(message_dictionary)
-
-    dm_message_dictionary = {
-        'message_id': unique_message_id,
-        'u_id': user_id,
-        'message': message,
-        'time_created': round(datetime.now().timestamp()),
-        'reacts': [{
-            'react_id': 1,
-            'u_ids': [],
-            'is_this_user_reacted': False
-        }],
-        'is_pinned': False
-    }
+    message_dictionary = Message(unique_message_id, user_id, message,
+        round(datetime.now().timestamp()), channel_id=-1, dm_id=dm_id,
+        reacts=[React(1)])
 
-    for msg in data['messages']:
-        if unique_message_id == msg['message_id']:
-            data['dms'][dm_id]['messages'].append(dm_message_dictionary)
+    add_message(message_dictionary)
     
     return {}
 
+register_job('sendlater_dm', message_sendlater_dm_helper)
+
 
 
 def message_pin_v1(token, message_id):
@@ -649,23 +513,9 @@ def message_pin_v1(token, message_id):
             raise AccessError(description=\
                 "The user corresponding to the given token is not the owner of the dm")
 
-    # Mark the message as pinned on the messages list of data
-    for msg in data['messages']:
-        if msg['message_id'] == message_id:
-            msg['is_pinned'] = True
-            ch_id = msg['channel_id']
-            dm_id = msg['dm_id']
-    
-    # Mark the message as pinned on the messages list of its corresponding
-    # channel of dm
-    if ch_id != -1:
-        for msg_channel in data['channels'][ch_id]['messages']:
-            if msg_channel['message_id'] == message_id:
-                msg_channel['is_pinned'] = True
-    else:
-        for msg_dm in data['dms'][dm_id]['messages']:
-            if msg_dm['message_id'] == message_id:
-                msg_dm['is_pinned'] = True
+    # Mark the message as pinned, which its channel or dm shares
+    get_message_record(message_id)['is_pinned'] = True
+    mark_dirty('messages', message_id)
     
     return {}
 
@@ -729,23 +579,9 @@ def message_unpin_v1(token, message_id):
             raise AccessError(description=\
                 "The user corresponding to the given token is not the owner of the dm")
 
-    # Mark the message as pinned on the messages list of data
-    for msg in data['messages']:
-        if msg['message_id'] == message_id:
-            msg['is_pinned'] = False
-            ch_id = msg['channel_id']
-            dm_id = msg['dm_id']
-    
-    # Mark the message as pinned on the messages list of its corresponding
-    # channel of dm
-    if ch_id != -1:
-        for msg_channel in data['channels'][ch_id]['messages']:
-            if msg_channel['message_id'] == message_id:
-                msg_channel['is_pinned'] = False
-    else:
-        for msg_dm in data['dms'][dm_id]['messages']:
-            if msg_dm['message_id'] == message_id:
-                msg_dm['is_pinned'] = False
+    # Mark the message as unpinned, which its channel or dm shares
+    get_message_record(message_id)['is_pinned'] = False
+    mark_dirty('messages', message_id)
     
     return {}
 # Create or add to a reaction to a message in channel/dm
@@ -778,21 +614,17 @@ def message_react_v1(token, message_id, react_id):
     user_id = auth_decode_token(token)
 
     # Check to see if message_id exists in an existing channel
-    found = 0
-    for message in data['messages']:
-        # If the message_id exists and is valid, copy important information
-        if message['message_id'] == message_id:
-            channel_id = message['channel_id']
-            dm_id = message['dm_id']
-            owner = message['u_id']
-            msg = message
-            found = 1
-            break
+    msg = get_message_record(message_id)
 
     # If it doesn't exist, raise error
-    if found == 0:
+    if msg is None:
         raise InputError(description="The given message_id is not valid")
 
+    # If the message_id exists and is valid, copy important information
+    channel_id = msg.channel_id
+    dm_id = msg.dm_id
+    owner = msg['u_id']
+
     # Check to see if user is authorised to react to the message (is in channel/dm)
     if not channel_id == -1:
         if user_id not in data['channels'][channel_id]['all_members']:
@@ -819,23 +651,11 @@ def message_react_v1(token, message_id, react_id):
     # Add the reaction
     # If the first to react with this react_id, create and append a reaction
     if len(msg['reacts']) == 0:
-        reaction_dict = {
-            'react_id': react_id,
-            'u_ids': [user_id],
-            'is_this_user_reacted': False,
-            }
-        msg['reacts'].append(reaction_dict)
-        if channel_id != -1:
-            for messages in data['channels'][channel_id]['messages']:
-                if messages['message_id'] == message_id:
-                    messages['reacts'].append(reaction_dict)
-        else:
-            for messages in data['dms'][dm_id]['messages']:
-                if messages['message_id'] == message_id:
-                    messages['reacts'].append(reaction_dict)
+        msg['reacts'].append(React(react_id, [user_id]))
     # Otherwise just add to u_ids list
     else:
         msg['reacts'][0]['u_ids'].append(user_id)
+    mark_dirty('messages', message_id)
     
     # Create notification message based on whether react was in dm or channel
     if channel_id != -1:
@@ -844,14 +664,11 @@ def message_react_v1(token, message_id, react_id):
         notification_message = (str(data['users'][user_id]['handle_str']) + " reacted to your message in " + str(data['dms'][dm_id]['name']))
     
     # Create notification for user being reacted to
-    data['users'][owner]['notifications'].append({
-        'channel_id' : channel_id,
-        'dm_id' : dm_id,
-        'notification_message' : notification_message
-    })
-    # Make sure notification list is len 20
-    if len(data['users'][owner]['notifications']) > 20:
-        data['users'][owner]['notifications'].pop(0)
+    notify(owner, Notification(
+        channel_id=channel_id,
+        dm_id=dm_id,
+        notification_message=notification_message
+    ))
 
     return { }
 
@@ -887,20 +704,16 @@ def message_unreact_v1(token, message_id, react_id):
     user_id = auth_decode_token(token)
 
     # Check to see if message_id exists in an existing channel
-    found = 0
-    for message in data['messages']:
-        # If the message_id exists and is valid, copy important information
-        if message['message_id'] == message_id:
-            channel_id = message['channel_id']
-            dm_id = message['dm_id']
-            msg = message
-            found = 1
-
+    msg = get_message_record(message_id)
 
     # If it doesn't exist, raise error
-    if found == 0:
+    if msg is None:
         raise InputError(description="The given message_id is not valid")
 
+    # If the message_id exists and is valid, copy important information
+    channel_id = msg.channel_id
+    dm_id = msg.dm_id
+
     # Check to see if user is authorised to react to the message (is in channel/dm)
     if not channel_id == -1:
         if user_id not in data['channels'][channel_id]['all_members']:
@@ -923,11 +736,9 @@ def message_unreact_v1(token, message_id, react_id):
         for i in msg['reacts']:
             for j in i['u_ids']:
                 if (j == user_id and i['react_id'] == react_id):
+                    # The react is kept with no u_ids once the last user unreacts
                     i['u_ids'].remove(user_id)
-                    # Delete react element if last u_id on the u_ids list
-                    if len(i['u_ids']) == 0: {
-                        msg['reacts'].clear()
-                    }
+                    mark_dirty('messages', message_id)
                     return {}
 
     # If not found, return an error, because we're not creating a new react
@@ -948,39 +759,24 @@ def message_unreact_v1(token, message_id, react_id):
 
 # Given a message_id return the channel in which it was sent
 def get_channel_id(message_id):
-    data = retrieve_data()
-    for msg in data['messages']:
-        if msg['message_id'] == message_id:
-            ch_id = msg['channel_id']
-    return ch_id
+    return get_message_record(message_id).channel_id
 
 # Given a message_id return the dm in which it was sent
 def get_dm_id(message_id):
-    data = retrieve_data()
-    dm_id = -1
-    for msg in data['messages']:
-        if msg['message_id'] == message_id:
-            dm_id = msg["dm_id"]
-    return dm_id
+    msg = get_message_record(message_id)
+    return msg.dm_id if msg is not None else -1
 
 
 # Given a message_id return the message within that message_id
 def get_message(message_id):
-    data = retrieve_data()
-    message = ""
-    for msg in data['messages']:
-        if msg['message_id'] == message_id:
-            message = msg["message"]
-    return message
+    msg = get_message_record(message_id)
+    return msg['message'] if msg is not None else ""
 
 # Given a message_id, return whether the message is a shared message or not
 def get_share_status(message_id):
-    data = retrieve_data()
-    share_status = False
-    for msg in data['messages']:
-        if msg['message_id'] == message_id:
-            share_status = msg['was_shared']
-    return share_status
+    msg = get_message_record(message_id)
+    return msg.was_shared if msg is not None else False
+
 
 
 # Given a message, return a tab in front of the relevant lines
@@ -1004,29 +800,15 @@ def tab_given_message(msg):
 
 # Given a message_id, check if the message refers to a valid message
 def check_message_existence(message_id):
-    data = retrieve_data()
-    message_exists = False
-    for msg in data['messages']:
-        if msg['message_id'] == message_id:
-            # Check to see if the message has been removed previously
-            if msg['is_removed'] == False:
-                message_exists = True
-    return message_exists
+    msg = get_message_record(message_id)
+    # Check to see if the message has been removed previously
+    return msg is not None and msg.is_removed == False
 
 
 # Given a message_id, check if the message is pinned
 def check_message_pin_status(message_id):
-    data = retrieve_data()
-    pin_status = 0
-    for msg in data['messages']:
-        if msg['message_id'] == message_id:
-            # Check to see if the message has been removed previously
-            if msg['is_pinned'] == True:
-                pin_status = 1
-    if pin_status == 1:
-        return True
-    else:
-        return False
+    msg = get_message_record(message_id)
+    return msg is not None and msg['is_pinned'] == True
 
 
 # Check for the access error conditions of message remove and message edit
@@ -1034,10 +816,9 @@ def check_access_error_conditions(token, message_id):
     data = retrieve_data()
     given_id = auth_decode_token(token)
     did_user_send, is_ch_owner, is_dm_owner, is_dreams_owner, is_owner = True, False, False, False, False
-    for msg_dict in data['messages']:
-        if msg_dict['message_id'] == message_id:
-            if msg_dict['u_id'] != given_id:
-                did_user_send = False
+    msg_dict = get_message_record(message_id)
+    if msg_dict is not None and msg_dict['u_id'] != given_id:
+        did_user_send = False
     # Now, check to see if the user is an owner of the channel
     ch_id = get_channel_id(message_id)
     dm_id = get_dm_id(message_id)
@@ -32,3 +32,39 @@ def notifications_get_v1(token):
     user_id = auth_decode_token(token)
 
     return {'notifications': data['users'][user_id]['notifications']}
+
+def notifications_get_v2(token, cursor=-1):
+    '''
+    BRIEF DESCRIPTION
+    Accesses the notifications a user has recieved since the last ones they saw,
+    out of their 20 most recent. Every notification is numbered in the order it
+    was recieved, and the number of the most recent is returned as the cursor to
+    pass next time
+    
+    Arguments:
+        token (int)  - The login session of the person accessing their notifications that were triggered by other functions
+        cursor (int) - The cursor returned by the last call, -1 for every notification kept
+
+    Exceptions:
+        InputError  - Occurs when cursor is not an integer
+        AccessError - Occurs when the token is invalid
+        
+    Return value:
+        notifications (list of notification data structures) - The notifications recieved after cursor, oldest first
+        cursor (int) - The number of the most recent notification, -1 if there are none
+    '''
+    # Make sure user is valid
+    if not auth_token_ok(token):
+        raise AccessError(description="The given token is not valid")
+
+    if not isinstance(cursor, int) or isinstance(cursor, bool):
+        raise InputError(description="The given cursor is not valid")
+
+    data = retrieve_data()
+    user_id = auth_decode_token(token)
+    notifications = data['users'][user_id]['notifications']
+
+    return {
+        'notifications': notifications.since(cursor),
+        'cursor': notifications.sequence - 1,
+    }
@@ -2,10 +2,8 @@
 # Written by Nikki Yao
 
 from src.error import InputError, AccessError 
-from src.data import retrieve_data
+from src.data import retrieve_data, clear_data, mark_dirty, search_messages, tombstone_user, user_containers, user_memberships, remove_member
 from src.auth import auth_token_ok, auth_decode_token
-import src.data
-import json
 
 def clear_v1():
     '''
@@ -22,14 +20,7 @@ def clear_v1():
         n/a, writes into a file called data.json
     '''
 
-    src.data.data = {
-        "users" : {},
-        "channels" : {},
-        "dms" : {},
-        "messages" : []
-    }
-    with open("data.json", "w") as FILE:
-        json.dump(src.data.data, FILE)
+    clear_data()
     return {}
 
 def search_v2(token, query_str):
@@ -47,7 +38,8 @@ def search_v2(token, query_str):
         InputError  - Occurs when the query_str is above 1000 characters
 
     Returns:
-        Returns a collection of messages in which the query_str is found
+        Returns a collection of messages in which the query_str is found, those
+        with the most occurrences of query_str first and then the most recent
     '''
     
     data = retrieve_data()
@@ -59,25 +51,16 @@ def search_v2(token, query_str):
     if not auth_token_ok(token): raise AccessError("Invalid token")
     auth_user_id = auth_decode_token(token)
 
-    # Create a collection of messages
-    collection_messages = []
-    # Find channels user is part of and return a collection of messages
-    for channel in data['channels']:
-        for member in data['channels'][channel]['all_members']:
-            if member == auth_user_id:
-                for message in data['channels'][channel]['messages']:
-                    # query_str is a substring of message 
-                    if query_str in message['message']:
-                        collection_messages.append(message['message'])
-    # Find DMs user is part of and return a collection of messages
-    for dm in data['dms']:
-        for member in data['dms'][dm]['members']:
-            if member == auth_user_id:
-                for message in data['dms'][dm]['messages']:
-                    # query_str is a substring of message 
-                    if query_str in message['message']:
-                        collection_messages.append(message['message'])
-    
+    # Find the messages query_str is a substring of and keep those sent to
+    # the user's channels/DMs
+    containers = user_containers(auth_user_id)
+    collection_messages = [message for message in search_messages(query_str)
+                           if (message.channel_id, message.dm_id) in containers]
+
+    # Rank by occurrences of query_str, the most recent first among equals
+    collection_messages.reverse()
+    collection_messages.sort(key=lambda message: (message['message'].count(query_str), message['time_created']), reverse=True)
+
     return {
         'messages': collection_messages
     }
@@ -128,44 +111,22 @@ def admin_user_remove_v1(token, u_id):
                 only_owner = True
     if admin_flag == 1 and only_owner == True: raise InputError("Token is currently the only global owner")
 
-    # Iterate through channels to identify which channels the user is in
-    for channel in data['channels']:      
+    # Iterate through the channels the user is in. Owners are always members
+    for channel in user_memberships('channels', u_id):
         # Remove user from the all_members list
-        for member in data['channels'][channel]['all_members']:
-            if u_id in data['channels'][channel]['all_members']:
-                for message in data['channels'][channel]['messages']:
-                    # Replace channel message with 'Removed user'
-                    if message['u_id'] == u_id:
-                        message['message'] = "Removed user"
-                data['channels'][channel]['all_members'].remove(u_id)
+        remove_member('channels', channel, u_id)
         # Remove user from the owner_members list
-        for member in data['channels'][channel]['owner_members']:
-            if u_id in data['channels'][channel]['owner_members']:
-                data['channels'][channel]['owner_members'].remove(u_id)
-                break
-
-    # Iterate through dms to identify which dms the user is in
-    for dm in data['dms']:
-        for member in data['dms'][dm]['members']:
-            if u_id in data['dms'][dm]['members']:
-                for message in data['dms'][dm]['messages']:
-                    # Replace dm message with 'Removed user'
-                    if message['u_id'] == u_id:
-                        message['message'] = "Removed user" 
-            # Remove user from the dm members list
-            data['dms'][dm]['members'].remove(member)
-
-    # Replace any messages from u_id with 'Removed user'
-    for message in data['messages']:
-        if message['u_id'] == u_id:
-            message['message'] = "Removed user"
-            break
-
-    # Replace user name with 'Removed user'
-    # Have user/profile/v2 to have an if statement for is_removed and only show their name 'Removed user'
-    for user in data['users']:
-        if user == u_id:
-            data['users'][user]['is_removed'] = True
+        if u_id in data['channels'][channel]['owner_members']:
+            data['channels'][channel]['owner_members'].remove(u_id)
+
+    # Iterate through the dms the user is in
+    for dm in user_memberships('dms', u_id):
+        # Remove user from the dm members list
+        remove_member('dms', dm, u_id)
+
+    # Flag the user as removed. Their messages read as 'Removed user' from now
+    # on and user/profile/v2 shows their name as 'Removed user'
+    tombstone_user(u_id)
     
     return {}
 
@@ -218,5 +179,6 @@ def admin_userpermission_change_v1(token, u_id, permission_id):
 
     # Change u_id permission to permission_id
     data['users'][u_id]['permission_id'] = permission_id
+    mark_dirty('users', u_id)
 
     return {}
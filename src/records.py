@@ -0,0 +1,365 @@
+# PROJECT-BACKEND: Team Echo
+
+'''
+Record types for the entities kept in src/data.py.
+
+Each entity is a slotted object instead of a dictionary, so a workspace with
+many messages doesn't pay for a hash table and a copy of every key per
+message. Records still read like the dictionaries they replaced
+(record['u_id'], record['reacts'] = [], 'email' in record) and compare equal
+to a dictionary with the same items, so feature code and callers are
+unchanged.
+
+    to_json()            - the record as the API returns it
+    from_json(value)     - build a record from that form
+    to_record()          - the record as it is persisted (src/storage.py)
+    from_record(value)   - build a record from that form
+
+Only messages and users differ between the two forms. Messages persist where
+they were sent and whether they were removed or shared, users persist the
+numbers of their notifications, without showing it in API output.
+'''
+
+from collections import deque
+from collections.abc import Mapping
+
+from src import config
+
+# Convert records (and lists/dictionaries holding them) for json. Also used as
+# the default= hook of the encoders in src/encoding.py
+def to_json(value):
+    if isinstance(value, (Record, Members, Notifications)):
+        return value.to_json()
+    if isinstance(value, (list, set)):
+        return [to_json(item) for item in value]
+    if isinstance(value, dict):
+        return {key: to_json(item) for key, item in value.items()}
+    return value
+
+class Record(Mapping):
+    '''
+    Base of the record types. Subclasses list their items in fields and may
+    keep further slots that are not items
+    '''
+
+    __slots__ = ()
+    fields = ()
+
+    def __getitem__(self, key):
+        if key not in self.fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.fields:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.fields
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_json()!r})"
+
+    def to_json(self):
+        return {field: to_json(getattr(self, field)) for field in self.fields}
+
+    @classmethod
+    def from_json(cls, value):
+        return cls(**value)
+
+    def to_record(self):
+        return self.to_json()
+
+    @classmethod
+    def from_record(cls, value):
+        return cls.from_json(value)
+
+class Members:
+    '''
+    The members of a channel or dm. Checking, adding and removing a member
+    take constant time like a set, while iterating gives members in the order
+    they joined like the list this replaced. It is persisted and compares
+    equal to that list
+    '''
+
+    __slots__ = ('order',)
+
+    def __init__(self, u_ids=()):
+        # u_id -> None, in the order members joined
+        self.order = dict.fromkeys(u_ids)
+
+    def __contains__(self, u_id):
+        try:
+            return u_id in self.order
+        except TypeError:
+            # Unhashable ids can't belong to anyone
+            return False
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __len__(self):
+        return len(self.order)
+
+    # The first member is read often (a dm's creator), the others rarely
+    def __getitem__(self, index):
+        if index == 0 and self.order:
+            return next(iter(self.order))
+        return list(self.order)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, Members):
+            return list(self.order) == list(other.order)
+        if isinstance(other, list):
+            return list(self.order) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Members({list(self.order)!r})"
+
+    def append(self, u_id):
+        self.order[u_id] = None
+
+    def remove(self, u_id):
+        try:
+            del self.order[u_id]
+        except KeyError:
+            raise ValueError(f"{u_id} is not a member") from None
+
+    def to_json(self):
+        return list(self.order)
+
+class React(Record):
+    __slots__ = fields = ('react_id', 'u_ids', 'is_this_user_reacted')
+
+    def __init__(self, react_id, u_ids=None, is_this_user_reacted=False):
+        self.react_id = react_id
+        self.u_ids = u_ids if u_ids is not None else []
+        self.is_this_user_reacted = is_this_user_reacted
+
+class Message(Record):
+    '''
+    The single record of a message, shared by data['messages'] and the
+    'messages' list of the channel or dm it was sent to. The text of an old
+    message may be frozen into a segment (src/segments.py) and read back from
+    there. Messages sent by a removed user read as removed_text
+    '''
+
+    fields = ('message_id', 'u_id', 'message', 'time_created', 'reacts', 'is_pinned')
+    __slots__ = ('message_id', 'u_id', 'text', 'time_created', 'reacts', 'is_pinned',
+                 'channel_id', 'dm_id', 'is_removed', 'was_shared', 'frozen')
+
+    # u_ids of the users removed from Dreams, kept by src/data.py
+    removed_authors = set()
+    removed_text = "Removed user"
+
+    def __init__(self, message_id, u_id, message, time_created, channel_id=-1, dm_id=-1,
+                 reacts=None, is_pinned=False, is_removed=False, was_shared=False):
+        self.message_id = message_id
+        self.u_id = u_id
+        self.message = message
+        self.time_created = time_created
+        self.reacts = [react if isinstance(react, React) else React.from_json(react)
+                       for react in reacts or []]
+        self.is_pinned = is_pinned
+        self.channel_id = channel_id
+        self.dm_id = dm_id
+        self.is_removed = is_removed
+        self.was_shared = was_shared
+
+    @property
+    def message(self):
+        if self.u_id in Message.removed_authors:
+            return Message.removed_text
+        return self.sent_message
+
+    # The text as it was sent or last edited, even if its sender was removed
+    @property
+    def sent_message(self):
+        if self.frozen is not None:
+            segment, index = self.frozen
+            return segment.text(index)
+        return self.text
+
+    @message.setter
+    def message(self, text):
+        self.text = text
+        self.frozen = None
+
+    # Drop the text, it is at index in segment
+    def freeze(self, segment, index):
+        self.text = None
+        self.frozen = (segment, index)
+
+    def to_record(self):
+        return dict(self.to_json(), channel_id=self.channel_id, dm_id=self.dm_id,
+                    is_removed=self.is_removed, was_shared=self.was_shared)
+
+    # Overwrite this record with a persisted one, keeping its identity so the
+    # channel or dm sharing it sees the change
+    def assign_record(self, value):
+        self.__init__(**value)
+
+class Notification(Record):
+    __slots__ = fields = ('channel_id', 'dm_id', 'notification_message')
+
+    def __init__(self, channel_id, dm_id, notification_message):
+        self.channel_id = channel_id
+        self.dm_id = dm_id
+        self.notification_message = notification_message
+
+class Notifications:
+    '''
+    The most recent notifications of a user, a ring buffer holding up to
+    config.notification_capacity of them. Every notification a user receives
+    is numbered in sequence so clients can ask for the ones after the last
+    they saw. Iterating gives the oldest first like the list this replaced,
+    and it compares equal to that list. It is persisted with the numbers
+    '''
+
+    __slots__ = ('entries', 'sequence')
+
+    def __init__(self, notifications=()):
+        # (number, notification) pairs, oldest first
+        self.entries = deque(maxlen=config.notification_capacity)
+        # Number of the next notification
+        self.sequence = 0
+        for notification in notifications:
+            if isinstance(notification, Notification):
+                self.append(notification)
+            else:
+                value = dict(notification)
+                number = value.pop('sequence', None)
+                self.append(Notification.from_json(value), number)
+
+    def __iter__(self):
+        return (notification for _, notification in self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        return list(self)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, Notifications):
+            return self.entries == other.entries
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Notifications({self.to_json()!r})"
+
+    # Add a notification, dropping the oldest if the buffer is full. Numbers
+    # are only given when the notification was persisted with one
+    def append(self, notification, number=None):
+        if number is None:
+            number = self.sequence
+        self.entries.append((number, notification))
+        self.sequence = number + 1
+
+    # Notifications numbered after cursor, oldest first
+    def since(self, cursor):
+        return [notification for number, notification in self.entries if number > cursor]
+
+    def to_json(self):
+        return [notification.to_json() for notification in self]
+
+    def to_record(self):
+        return [dict(notification.to_json(), sequence=number) for number, notification in self.entries]
+
+class User(Record):
+    __slots__ = fields = ('name_first', 'name_last', 'email', 'password', 'handle_str',
+                          'permission_id', 'sessions', 'is_removed', 'dms', 'notifications')
+
+    def __init__(self, name_first, name_last, email, password, handle_str='', permission_id=2,
+                 sessions=None, is_removed=False, dms=None, notifications=None):
+        self.name_first = name_first
+        self.name_last = name_last
+        self.email = email
+        self.password = password
+        self.handle_str = handle_str
+        self.permission_id = permission_id
+        self.sessions = set(sessions) if sessions is not None else set()
+        self.is_removed = is_removed
+        self.dms = dms if dms is not None else []
+        self.notifications = Notifications(notifications or ())
+
+    def to_record(self):
+        return dict(self.to_json(), notifications=self.notifications.to_record())
+
+class Job(Record):
+    '''
+    A job waiting in src/scheduler.py, see schedule_job() in src/data.py
+    '''
+
+    __slots__ = fields = ('kind', 'time', 'args')
+
+    def __init__(self, kind, time, args):
+        self.kind = kind
+        self.time = time
+        self.args = args
+
+class Totals(Record):
+    '''
+    The totals of the workspace at one time, a point of the users/stats
+    history kept in data['stats'], see record_totals() in src/data.py
+    '''
+
+    __slots__ = fields = ('time_stamp', 'num_channels_exist', 'num_dms_exist', 'num_messages_exist')
+
+    def __init__(self, time_stamp, num_channels_exist, num_dms_exist, num_messages_exist):
+        self.time_stamp = time_stamp
+        self.num_channels_exist = num_channels_exist
+        self.num_dms_exist = num_dms_exist
+        self.num_messages_exist = num_messages_exist
+
+class Channel(Record):
+    '''
+    A channel. Its 'messages' list refers to the records in data['messages']
+    and isn't persisted, src/storage.py rebuilds it on load
+    '''
+
+    __slots__ = fields = ('name', 'is_public', 'owner_members', 'all_members', 'messages', 'standup')
+
+    def __init__(self, name, is_public, owner_members=None, all_members=None, messages=None, standup=None):
+        self.name = name
+        self.is_public = is_public
+        self.owner_members = Members(owner_members or ())
+        self.all_members = Members(all_members or ())
+        self.messages = messages if messages is not None else []
+        self.standup = standup if standup is not None else {'is_active': False, 'time_finish': None, 'messages': []}
+
+    def to_record(self):
+        record = self.to_json()
+        del record['messages']
+        return record
+
+class Dm(Record):
+    '''
+    A dm. Like a channel, its 'messages' list isn't persisted
+    '''
+
+    __slots__ = fields = ('name', 'members', 'messages')
+
+    def __init__(self, name, members=None, messages=None):
+        self.name = name
+        self.members = Members(members or ())
+        self.messages = messages if messages is not None else []
+
+    def to_record(self):
+        record = self.to_json()
+        del record['messages']
+        return record
@@ -0,0 +1,50 @@
+# PROJECT-BACKEND: Team Echo
+
+'''
+A single thread that runs jobs at the time they are due.
+
+Pending jobs are kept in a heap of (time, job_id), so a scheduled message
+costs a heap entry rather than a thread of its own. The jobs themselves live
+in data['jobs'] so they are persisted with the rest of the store, see
+schedule_job() in src/data.py.
+'''
+
+import heapq
+import threading
+import time
+import traceback
+
+class Scheduler:
+    def __init__(self, run):
+        # Called with the job_id of every job once it's due
+        self.run = run
+        self.heap = []
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def schedule(self, job_id, when):
+        with self.condition:
+            heapq.heappush(self.heap, (when, job_id))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.loop, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    # Drop every pending job
+    def reset(self):
+        with self.condition:
+            self.heap.clear()
+            self.condition.notify()
+
+    def loop(self):
+        while True:
+            with self.condition:
+                while not self.heap or self.heap[0][0] > time.time():
+                    self.condition.wait(self.heap[0][0] - time.time() if self.heap else None)
+                _, job_id = heapq.heappop(self.heap)
+
+            # A failing job mustn't take the scheduler down with it
+            try:
+                self.run(job_id)
+            except Exception:
+                traceback.print_exc()
@@ -0,0 +1,97 @@
+# PROJECT-BACKEND: Team Echo
+
+'''
+Inverted index used by search/v2.
+
+Every message that hasn't been removed is indexed under each distinct
+trigram (3 character substring) of its text. A query of 3 or more characters
+can only be a substring of messages holding all of the query's trigrams, so
+intersecting their postings gives a small candidate set which is then checked
+with `in`. Shorter queries check every indexed message.
+
+The postings are only built once the first query needs them, so loading the
+store doesn't read the text of every message (see src/segments.py and binary
+snapshots in src/storage.py, which both leave text out of memory).
+
+Messages are indexed under the text they were sent with (Message.sent_message)
+and checked against the text they read as, so the messages of a removed user
+are only found by search_messages() in src/data.py.
+'''
+
+# Length of the substrings messages are indexed under
+GRAM = 3
+
+def trigrams(text):
+    return {text[start:start + GRAM] for start in range(len(text) - GRAM + 1)}
+
+class TrigramIndex:
+    def __init__(self, messages=()):
+        # trigram -> message_ids of the messages containing it, None until
+        # built by the first query of 3 or more characters
+        self.postings = None
+        # message_id -> record of every indexed message
+        self.messages = {}
+        # message_id -> number giving the order messages were sent in
+        self.sequence = {}
+        self.sent = 0
+
+        for message in messages:
+            if not message.is_removed:
+                self.add(message)
+
+    def add(self, message):
+        self.messages[message.message_id] = message
+        self.sequence[message.message_id] = self.sent
+        self.sent += 1
+        if self.postings is not None:
+            self.post(message.message_id, trigrams(message.sent_message))
+
+    def discard(self, message):
+        if self.messages.pop(message.message_id, None) is None:
+            return
+        del self.sequence[message.message_id]
+        if self.postings is not None:
+            self.unpost(message.message_id, trigrams(message.sent_message))
+
+    # Reindex a message after its text changed from old_text
+    def update(self, message, old_text):
+        if message.message_id not in self.messages or self.postings is None:
+            return
+        old_grams, new_grams = trigrams(old_text), trigrams(message.sent_message)
+        self.unpost(message.message_id, old_grams - new_grams)
+        self.post(message.message_id, new_grams - old_grams)
+
+    # Index every message, in the order they were sent
+    def build(self):
+        self.postings = {}
+        for message_id, message in self.messages.items():
+            self.post(message_id, trigrams(message.sent_message))
+
+    def post(self, message_id, grams):
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(message_id)
+
+    def unpost(self, message_id, grams):
+        for gram in grams:
+            postings = self.postings.get(gram)
+            if postings is not None:
+                postings.discard(message_id)
+                if not postings:
+                    del self.postings[gram]
+
+    # Messages whose text contains query, in the order they were sent
+    def search(self, query):
+        if len(query) < GRAM:
+            candidates = self.messages.keys()
+        else:
+            if self.postings is None:
+                self.build()
+            postings = sorted((self.postings.get(gram, set()) for gram in trigrams(query)), key=len)
+            candidates = postings[0].intersection(*postings[1:])
+
+        # Check the candidates in the order they were sent. Old messages share
+        # segment files in that order (src/segments.py), so each file is read
+        # once for its run of candidates instead of once per candidate
+        candidates = sorted(candidates, key=self.sequence.__getitem__)
+        return [self.messages[message_id] for message_id in candidates
+                if query in self.messages[message_id].message]
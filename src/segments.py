@@ -0,0 +1,70 @@
+# PROJECT-BACKEND: Team Echo
+
+'''
+Cold storage for the text of old messages.
+
+A channel or dm keeps the text of its most recent messages in memory. Once
+config.message_tail newer messages follow a run of config.segment_size older
+ones, the text of that run is written to a segment file of its own and
+dropped from the message records, which read it back when it's next needed
+(see Message.message in src/records.py). Only config.resident_segments
+segments are kept in memory once read, the least recently used go first.
+
+The storage engine still persists every message in full, so segments are a
+cache: they live in a temporary directory and are rebuilt whenever the store
+is loaded.
+'''
+
+from collections import OrderedDict
+import os
+import shutil
+import tempfile
+import threading
+
+from src.encoding import dumps, loads
+
+class SegmentStore:
+    def __init__(self, resident):
+        self.resident = resident
+        self.directory = None
+        # path -> texts of the segments read most recently, oldest first
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Move the text of messages into the segment file name
+    def freeze(self, name, messages):
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="echo-segments-")
+        segment = Segment(self, os.path.join(self.directory, name))
+        with open(segment.path, "wb") as FILE:
+            FILE.write(dumps([message.sent_message for message in messages]))
+        for index, message in enumerate(messages):
+            message.freeze(segment, index)
+
+    def read(self, path):
+        with self.lock:
+            texts = self.cache.get(path)
+            if texts is not None:
+                self.cache.move_to_end(path)
+                return texts
+            with open(path, "rb") as FILE:
+                texts = self.cache[path] = loads(FILE.read())
+            if len(self.cache) > self.resident:
+                self.cache.popitem(last=False)
+            return texts
+
+    # Drop every segment, the records frozen into them must be gone too
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            if self.directory is not None:
+                shutil.rmtree(self.directory, ignore_errors=True)
+                self.directory = None
+
+class Segment:
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+
+    def text(self, index):
+        return self.store.read(self.path)[index]
@@ -2,15 +2,15 @@
 # Written by Brendan Ye, Darrell Mounarath, Kellen, Winston Lin, Nikki Yao
 
 import sys
-from json import dumps
-import json
+import atexit
 from flask import Flask, request
 from flask_cors import CORS
 
 from src.error import InputError
 from src import config
 
-from src.data import read_data, write_data
+from src.data import read_data, start_flusher, stop_flusher, sync_data, store_lock
+from src.encoding import dumps
 from src.auth import auth_login_v1, auth_register_v1, auth_logout_v1
 from src.channel import channel_details_v2, channel_join_v2, channel_invite_v2, channel_addowner_v1, channel_removeowner_v1, channel_messages_v2, channel_leave_v1
 from src.channels import channels_create_v2, channels_list_v2, channels_listall_v2
@@ -18,7 +18,7 @@ from src.dm import dm_create_v1, dm_messages_v1, dm_details_v1, dm_leave_v1, dm_
 from src.user import user_profile_v2, user_profile_setname_v2, user_profile_setemail_v2, user_profile_sethandle_v2, user_profile_uploadphoto_v1, users_all_v1, user_stats_v1, users_stats_v1
 from src.message import message_send_v2, message_remove_v1, message_edit_v2, message_share_v1, message_senddm_v1 , message_react_v1, message_unreact_v1, message_sendlater_v1, message_sendlaterdm_v1, message_pin_v1, message_unpin_v1
 from src.other import clear_v1, admin_userpermission_change_v1, admin_user_remove_v1, search_v2
-from src.notifications import notifications_get_v1
+from src.notifications import notifications_get_v1, notifications_get_v2
 from src.standup import standup_start_v1, standup_active_v1, standup_send_v1
 
 def defaultHandler(err):
@@ -38,6 +38,16 @@ CORS(APP)
 APP.config['TRAP_HTTP_EXCEPTIONS'] = True
 APP.register_error_handler(Exception, defaultHandler)
 
+# Requests change the store one at a time, so the flusher never writes out an
+# entity in the middle of a change (see store_lock in src/data.py)
+@APP.before_request
+def lock_store():
+    store_lock.acquire()
+
+@APP.teardown_request
+def unlock_store(error):
+    store_lock.release()
+
 # Example
 @APP.route("/echo", methods=['GET'])
 def echo():
@@ -58,8 +68,6 @@ def free_marks():
 def auth_register_v2_flask():
     payload = request.get_json()
     returnDict = auth_register_v1(payload['email'], payload['password'], payload['name_first'], payload['name_last'])
-
-    write_data()
     return dumps(returnDict)
 
 
@@ -67,8 +75,6 @@ def auth_register_v2_flask():
 def auth_login_v2_flask():
     payload = request.get_json()
     returnDict = auth_login_v1(payload['email'], payload['password'])
-
-    write_data()
     return dumps(returnDict)
 
 
@@ -76,8 +82,6 @@ def auth_login_v2_flask():
 def auth_logout_route():
     payload = request.get_json()
     returnDict = auth_logout_v1(payload['token'])
-
-    write_data()
     return dumps(returnDict)
 
 
@@ -85,8 +89,6 @@ def auth_logout_route():
 def channels_create_v2_flask():
     data = request.get_json()
     channel_id = channels_create_v2(data['token'], data['name'], data['is_public'])
-
-    write_data()
     return dumps(channel_id)
 
 
@@ -119,8 +121,6 @@ def channel_join_v2_flask():
     channel_id = payload['channel_id']
     response = channel_join_v2(token,channel_id)
 
-
-    write_data()
     return dumps(response)
 
 
@@ -131,8 +131,6 @@ def channel_invite_v2_flask():
     channel_id = payload['channel_id']
     u_id = payload['u_id']
     response = channel_invite_v2(token,channel_id,u_id)
-
-    write_data()
     return dumps(response)
 
 
@@ -143,8 +141,6 @@ def channel_addowner_v1_flask():
     channel_id = payload['channel_id']
     u_id = payload['u_id']
     response = channel_addowner_v1(token,channel_id,u_id)
-
-    write_data()
     return dumps(response)
 
 
@@ -155,8 +151,6 @@ def channel_removeowner_v1_flask():
     channel_id = payload['channel_id']
     u_id = payload['u_id']
     response = channel_removeowner_v1(token,channel_id,u_id)
-
-    write_data()
     return dumps(response)
 
 
@@ -176,8 +170,6 @@ def channel_leave_v1_flask():
     token = payload['token']
     channel_id = payload['channel_id']
     response = channel_leave_v1(token,channel_id)
-
-    write_data()
     return dumps(response)
 
 
@@ -185,8 +177,6 @@ def channel_leave_v1_flask():
 def dm_create_v1_flask(): 
     info = request.get_json()
     dm_id = dm_create_v1(info["token"], info["u_ids"])
-
-    write_data()
     return dumps(dm_id)
     
 
@@ -213,8 +203,6 @@ def dm_details_v1_flask():
 def dm_leave_v1_flask(): 
     info = request.get_json()
     dm_leave_v1(info["token"], info["dm_id"])
-
-    write_data()
     return dumps({})
 
 
@@ -222,8 +210,6 @@ def dm_leave_v1_flask():
 def dm_invite_v1_flask(): 
     data = request.get_json()
     dm_invite_v1(data["token"], data["dm_id"], data["u_id"])
-
-    write_data()
     return dumps({})
 
 
@@ -239,8 +225,6 @@ def dm_list_v1_flask():
 def dm_remove_v1_flask(): 
     data = request.get_json()
     dm_remove_v1(data["token"], data["dm_id"])
-
-    write_data()
     return dumps({})
 
 
@@ -251,8 +235,6 @@ def message_send_v2_flask():
     channel_id = int(payload['channel_id'])
     message = payload['message']
     response = message_send_v2(token,channel_id,message)
-
-    write_data()
     return dumps(response)
 
 
@@ -263,16 +245,12 @@ def message_senddm_v1_flask():
     dm_id = payload['dm_id']
     message = payload['message']
     response = message_senddm_v1(token,dm_id,message)
-
-    write_data()
     return dumps(response)
 
 @APP.route("/message/remove/v1", methods=['DELETE'])
 def message_remove_v1_flask():
     data = request.get_json()
     message_remove_v1(data["token"], data["message_id"])
-    
-    write_data()
     return dumps({})
 
 
@@ -283,8 +261,6 @@ def message_edit_v2_flask():
     message_id = int(data["message_id"])
     message = data["message"]
     response = message_edit_v2(token, message_id, message)
-
-    write_data()
     return dumps(response)
 
 
@@ -294,8 +270,6 @@ def message_share_v1_flask():
     token, og_message_id = data["token"], data["og_message_id"]
     message, channel_id, dm_id = data["message"], data['channel_id'], data['dm_id']
     shared = message_share_v1(token, og_message_id, message, channel_id, dm_id)
-
-    write_data()
     return dumps(shared)
 
 
@@ -307,8 +281,6 @@ def message_sendlater_v1_flask():
     message = data['message']
     time_sent = data['time_sent']
     response = message_sendlater_v1(token, channel_id, message, time_sent)
-
-    write_data()
     return dumps(response)
 
 
@@ -320,8 +292,6 @@ def message_sendlaterdm_v1_flask():
     message = data['message']
     time_sent = data['time_sent']
     response = message_sendlaterdm_v1(token, dm_id, message, time_sent)
-
-    write_data()
     return dumps(response)
 
 
@@ -331,8 +301,6 @@ def message_pin_v1_flask():
     token = data['token']
     message_id = data['message_id']
     response = message_pin_v1(token, message_id)
-
-    write_data()
     return dumps(response)
 
 
@@ -342,8 +310,6 @@ def message_unpin_v1_flask():
     token = data['token']
     message_id = data['message_id']
     response = message_unpin_v1(token, message_id)
-
-    write_data()
     return dumps(response)
 
 
@@ -354,8 +320,6 @@ def message_react_v1_flask():
     message_id = payload['message_id']
     react_id = payload['react_id']
     response = message_react_v1(token, message_id, react_id)
-
-    write_data()
     return dumps(response)
 
 
@@ -366,16 +330,12 @@ def message_unreact_v1_flask():
     message_id = payload['message_id']
     react_id = payload['react_id']
     response = message_unreact_v1(token, message_id, react_id)
-
-    write_data()
     return dumps(response)
 
 @APP.route("/standup/start/v1", methods=['POST'])
 def standup_start_v1_flask():
     data = request.get_json()
     time_finish = standup_start_v1(data['token'], data['channel_id'], data['length'])
-
-    write_data()
     return dumps(time_finish)
 
 
@@ -392,8 +352,6 @@ def standup_active_v1_flask():
 def standup_send_v1_flask():
     data = request.get_json()
     standup_send_v1(data['token'], data['channel_id'], data['message'])
-
-    write_data()
     return dumps({})
 
 
@@ -404,6 +362,20 @@ def notification_get_v1_flask():
     return dumps(notifications_get_v1(token))
 
 
+@APP.route("/notifications/get/v2", methods=['GET'])
+def notification_get_v2_flask():
+    token = request.args.get('token')
+    cursor = request.args.get('cursor', -1)
+    # A cursor that isn't a number is passed on as is, to be rejected with an
+    # InputError once the token has been checked
+    try:
+        cursor = int(cursor)
+    except ValueError:
+        pass
+
+    return dumps(notifications_get_v2(token, cursor))
+
+
 @APP.route('/user/profile/v2', methods=['GET'])
 def user_profile_v2_flask():
     token = request.args.get('token')
@@ -417,8 +389,6 @@ def user_profile_v2_flask():
 def user_profile_setname_v2_flask():
     payload = request.get_json()
     returnDict = user_profile_setname_v2(payload['token'], payload['name_first'], payload['name_last'])
-
-    write_data()
     return dumps(returnDict)  
 
 
@@ -426,8 +396,6 @@ def user_profile_setname_v2_flask():
 def user_profile_setemail_v2_flask():
     payload = request.get_json()
     returnDict = user_profile_setemail_v2(payload['token'], payload['email'])
-
-    write_data()
     return dumps(returnDict) 
 
 
@@ -435,8 +403,6 @@ def user_profile_setemail_v2_flask():
 def user_profile_sethandle_v2_flask():
     payload = request.get_json()
     returnDict = user_profile_sethandle_v2(payload['token'], payload['handle_str'])
-
-    write_data()
     return dumps(returnDict) 
     
     
@@ -452,8 +418,6 @@ def user_profile_uploadphoto_flask():
 def user_stats_v1_flask():
     token = request.args.get('token')
     response = user_stats_v1(token)
-
-    write_data()
     return dumps(response)
 
 
@@ -461,8 +425,6 @@ def user_stats_v1_flask():
 def users_stats_v1_flask():
     token = request.args.get('token')
     response = users_stats_v1(token)
-
-    write_data()
     return dumps(response)
 
 
@@ -470,8 +432,6 @@ def users_stats_v1_flask():
 def users_all_v1_flask():
     token = request.args.get('token')
     response = users_all_v1(token)
-
-    write_data()
     return dumps(response)
 
 
@@ -482,8 +442,6 @@ def admin_userpermission_change_v1_flask():
     u_id = payload['u_id']
     permission_id = payload['permission_id']
     response = admin_userpermission_change_v1(token, u_id, permission_id)
-
-    write_data()
     return dumps(response)
 
 
@@ -493,8 +451,6 @@ def admin_user_remove_v1_flask():
     token = payload['token']
     u_id = int(payload['u_id'])
     response = admin_user_remove_v1(token, u_id)
-
-    write_data()
     return dumps(response)
 
 
@@ -513,5 +469,12 @@ def clear_v1_flask():
     return {}
 
 if __name__ == "__main__":
-    APP.run(debug=True, port=config.port) # Do not edit this port
     read_data()
+    # Changes are written out in the background, make sure the last of them
+    # reach the disk before the server exits
+    start_flusher()
+    atexit.register(sync_data)
+    atexit.register(stop_flusher)
+    # The reloader would run all of this again in a second process, running
+    # every job twice and writing the same journal from both
+    APP.run(debug=True, use_reloader=False, port=config.port) # Do not edit this port
@@ -1,27 +1,47 @@
 # PROJECT-BACKEND: Team Echo
 # Written by Darrell Mounarath
 
-from src.data import retrieve_data
+from src.data import retrieve_data, mark_dirty, register_job, schedule_job
 from src.error import AccessError, InputError
 from src.auth import auth_token_ok, auth_decode_token
-from src.message import message_send_v2
-import threading
-import time
+from src.message import message_send_channel_helper
 from datetime import datetime
 
-# THREAD FUNCTION
-def send_message(token, channel_id, length, time_finish):
+# Longest message a standup sends, longer summaries are split over several
+STANDUP_MESSAGE_LENGTH = 1000
+
+# JOB FUNCTION
+# Send the buffered lines of a finished standup from the user who started it
+def standup_finish(channel_id, u_id):
     data = retrieve_data()
 
-    data['channels'][channel_id]['standup']['is_active'] = True
-    data['channels'][channel_id]['standup']['time_finish'] = time_finish
-    time.sleep(length)
-    message_str = ""
-    for message in messages:
-        message_str += f"{message}" if message == messages[-1] else f"{message}\n"
-    message_send_v2(token, channel_id, message_str)
-    data['channels'][channel_id]['standup']['is_active'] = False
-    data['channels'][channel_id]['standup']['time_finish'] = None
+    # The channel may have been removed since the standup started
+    if channel_id not in data['channels']: return
+
+    standup = data['channels'][channel_id]['standup']
+    for message_str in standup_chunks(standup.get('messages', [])):
+        message_send_channel_helper(u_id, channel_id, message_str)
+    standup['is_active'] = False
+    standup['time_finish'] = None
+    standup['messages'] = []
+    mark_dirty('channels', channel_id)
+
+register_job('standup_finish', standup_finish)
+
+# Join lines with newlines into as few messages of at most
+# STANDUP_MESSAGE_LENGTH characters as keep every line in one piece, only
+# splitting lines too long for a message of their own
+def standup_chunks(lines):
+    chunks = []
+    for line in lines:
+        pieces = [line[start:start + STANDUP_MESSAGE_LENGTH]
+                  for start in range(0, len(line), STANDUP_MESSAGE_LENGTH)] or [""]
+        for piece in pieces:
+            if chunks and len(chunks[-1]) + 1 + len(piece) <= STANDUP_MESSAGE_LENGTH:
+                chunks[-1] += "\n" + piece
+            else:
+                chunks.append(piece)
+    return chunks
 
 # ASSUMPTION: Length cannot be negative, and can be as large as any amount
 def standup_start_v1(token, channel_id, length):
@@ -63,12 +83,16 @@ def standup_start_v1(token, channel_id, length):
     # Checks if standup exists
     if data['channels'][channel_id]['standup']['is_active'] == True: raise InputError
 
-    global messages
-    messages = []
-    
-    time_finish = int(datetime.now().timestamp() + length)
-    t = threading.Thread(target=send_message, args=(token, channel_id, length, time_finish))
-    t.start()
+    # Buffer messages in the channel until the standup finishes
+    now = datetime.now().timestamp()
+    time_finish = int(now + length)
+    data['channels'][channel_id]['standup'] = {
+        'is_active' : True,
+        'time_finish' : time_finish,
+        'messages' : [],
+    }
+    mark_dirty('channels', channel_id)
+    schedule_job('standup_finish', now + length, {'channel_id': channel_id, 'u_id': auth_user_id})
 
     return {"time_finish" : time_finish}
 
@@ -143,5 +167,5 @@ def standup_send_v1(token, channel_id, message):
 
     new_message = f"{data['users'][auth_user_id]['handle_str']}: {message}"
 
-    global messages
-    messages.append(new_message)
\ No newline at end of file
+    data['channels'][channel_id]['standup']['messages'].append(new_message)
+    mark_dirty('channels', channel_id)
\ No newline at end of file
@@ -0,0 +1,850 @@
+# PROJECT-BACKEND: Team Echo
+
+'''
+Storage engines used by src/data.py to persist the store.
+
+The feature functions always work on the in-memory data dictionary. An engine
+only decides how the entities they change are written out and how the
+dictionary is rebuilt on startup. Every engine provides:
+
+    load()                 - rebuild and return the data dictionary
+    save(records, data)    - persist a batch of changed entities
+    snapshot(data)         - write out the whole store
+    sync()                 - wait until everything saved is on the disk
+    clear(data)            - reset the persisted store to the given data
+
+A record is {'table': ..., 'key': ..., 'value': ...} where value is None if
+the entity was deleted.
+
+Each message is stored once, in data['messages']. The 'messages' list of a
+channel or dm holds references to those same records and is never written
+out, it is rebuilt from the message order on load.
+'''
+
+import hashlib
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import zlib
+
+from src.records import Message, React, Notification, User, Channel, Dm, Job, Totals
+from src.encoding import dumps, loads
+
+SNAPSHOT_FILE = "data.json"
+JOURNAL_FILE = "data.log"
+DATABASE_FILE = "data.db"
+# Number of journal records after which a background snapshot compacts the log
+COMPACT_THRESHOLD = 1000
+# Number of snapshots kept, the current one included
+SNAPSHOT_RETENTION = 3
+
+def empty_data():
+    return {
+        "users" : {},
+        "channels" : {},
+        "dms" : {},
+        "messages" : [],
+        "jobs" : {},
+        "stats" : {},
+    }
+
+# Record types of each table, see src/records.py
+RECORDS = {
+    'users': User,
+    'channels': Channel,
+    'dms': Dm,
+    'messages': Message,
+    'jobs': Job,
+    'stats': Totals,
+}
+
+# Version of the layout encode_data() writes. A snapshot of an older version
+# is brought up to date by MIGRATIONS when it is loaded
+SCHEMA_VERSION = 2
+
+# Tables keyed by id, and the type of their ids
+KEYS = {
+    'users': int,
+    'channels': int,
+    'dms': int,
+    'jobs': int,
+    'stats': int,
+}
+
+def encode_data(data):
+    return {
+        'version': SCHEMA_VERSION,
+        'users': {key: user.to_record() for key, user in data['users'].items()},
+        'channels': {key: channel.to_record() for key, channel in data['channels'].items()},
+        'dms': {key: dm.to_record() for key, dm in data['dms'].items()},
+        'messages': [message.to_record() for message in data['messages']],
+        'jobs': {key: job.to_record() for key, job in data['jobs'].items()},
+        'stats': {key: totals.to_record() for key, totals in data['stats'].items()},
+    }
+
+# Point the 'messages' list of every channel and dm at the records of the
+# messages sent to it, in the order they were sent
+def attach_messages(data):
+    for container in list(data['channels'].values()) + list(data['dms'].values()):
+        container['messages'] = []
+    for message in data['messages']:
+        container = message_container(data, message)
+        if container is not None:
+            container['messages'].append(message)
+    return data
+
+# The channel or dm a message was sent to, or None if it has been deleted
+def message_container(data, message):
+    if message.channel_id != -1:
+        return data['channels'].get(message.channel_id)
+    return data['dms'].get(message.dm_id)
+
+###############################################################################
+#                                   MEMORY                                    #
+###############################################################################
+
+# Keeps nothing outside the process, for tests and throwaway servers
+class MemoryStorage:
+    def load(self):
+        return empty_data()
+
+    def save(self, records, data):
+        pass
+
+    def snapshot(self, data):
+        pass
+
+    def sync(self):
+        pass
+
+    def clear(self, data):
+        pass
+
+###############################################################################
+#                                   JOURNAL                                   #
+###############################################################################
+
+# Write a file so that it is either entirely there or not changed at all, and
+# on the disk once this returns. The content is staged in a temporary file
+# which then replaces the file in one rename
+def write_file(path, content):
+    stage_file(path, content)
+    install_file(path)
+
+def stage_file(path, content):
+    with open(path + ".tmp", "wb") as FILE:
+        FILE.write(content)
+        FILE.flush()
+        os.fsync(FILE.fileno())
+
+def install_file(path):
+    os.replace(path + ".tmp", path)
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+# Name of a kept snapshot or journal, generation 0 being the current one
+def generation_file(name, generation):
+    return name if generation == 0 else f"{name}.{generation}"
+
+# A snapshot is the sha256 of its json on the first line, then the json
+def encode_snapshot(data):
+    snapshot = dumps(encode_data(data))
+    return hashlib.sha256(snapshot).hexdigest().encode() + b"\n" + snapshot
+
+def read_snapshot(path):
+    with open(path, "rb") as FILE:
+        content = FILE.read()
+    # Snapshots written before checksums were added are plain json
+    if not content.startswith(b"{"):
+        checksum, _, content = content.partition(b"\n")
+        if hashlib.sha256(content).hexdigest().encode() != checksum:
+            raise ValueError(f"{path} doesn't match its checksum")
+    return attach_messages(decode_snapshot(loads(content)))
+
+# data.json holds the last full snapshot of the store and data.log the records
+# appended since. Once enough records pile up a background snapshot folds the
+# log back into data.json.
+#
+# The previous SNAPSHOT_RETENTION - 1 snapshots are kept as data.json.1,
+# data.json.2, ... each with the journal leading from it to the next one
+# (data.log.1, data.log.2, ...), so the store can still be rebuilt if the
+# newest snapshot is damaged
+class JournalStorage:
+    # Where snapshots are written and how they are encoded
+    snapshot_file = SNAPSHOT_FILE
+    encode_snapshot = staticmethod(encode_snapshot)
+    read_snapshot = staticmethod(read_snapshot)
+
+    def __init__(self):
+        self.records = 0
+        self.lock = threading.Lock()
+        self.compacting = False
+
+    def load(self):
+        # Start from the newest snapshot that is intact
+        data, generation, damaged = None, 0, []
+        for generation in range(SNAPSHOT_RETENTION):
+            try:
+                data = self.read_snapshot(generation_file(self.snapshot_file, generation))
+                break
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError, KeyError) as error:
+                damaged.append(error)
+        # A store switching over to another snapshot format starts from its
+        # json snapshot
+        if data is None and not damaged and self.snapshot_file != SNAPSHOT_FILE and os.path.exists(SNAPSHOT_FILE):
+            data, generation = read_snapshot(SNAPSHOT_FILE), 0
+        if data is None:
+            if damaged:
+                raise ValueError(f"No intact snapshot to load: {damaged}")
+            data, generation = empty_data(), 0
+
+        # Replay every record appended since the snapshot was taken. A crash
+        # in the middle of an append leaves a partial last line, which is skipped
+        positions = {message['message_id']: index for index, message in enumerate(data['messages'])}
+        for journal in range(generation, -1, -1):
+            self.records = self.replay(data, generation_file(JOURNAL_FILE, journal), positions)
+        return data
+
+    def replay(self, data, path, positions):
+        records = 0
+        try:
+            with open(path, "rb") as FILE:
+                for line in FILE:
+                    try:
+                        record = loads(line)
+                    except ValueError:
+                        break
+                    apply_record(data, record, positions)
+                    records += 1
+        except OSError:
+            pass
+        return records
+
+    def save(self, records, data):
+        with self.lock:
+            with open(JOURNAL_FILE, "ab") as FILE:
+                FILE.write(b''.join(dumps(record) + b"\n" for record in records))
+            self.records += len(records)
+
+            if self.records < COMPACT_THRESHOLD or self.compacting:
+                return
+            self.compacting = True
+        threading.Thread(target=self.snapshot, args=[data]).start()
+
+    # Write a full snapshot of the store and move the journal records it
+    # covers out of data.log. Records are whole entities, so replaying one the
+    # snapshot already contains is harmless
+    def snapshot(self, data):
+        try:
+            with self.lock:
+                offset = os.path.getsize(JOURNAL_FILE) if os.path.exists(JOURNAL_FILE) else 0
+
+            # Requests keep mutating the store while it is serialised, retry
+            # if a dictionary changes size underneath json
+            for _ in range(5):
+                try:
+                    snapshot = self.encode_snapshot(data)
+                    break
+                except RuntimeError:
+                    continue
+            else:
+                return
+
+            stage_file(self.snapshot_file, snapshot)
+
+            # A crash at any point leaves a snapshot followed by journals
+            # holding every record since
+            with self.lock:
+                journal = b""
+                if os.path.exists(JOURNAL_FILE):
+                    with open(JOURNAL_FILE, "rb") as FILE:
+                        journal = FILE.read()
+                self.rotate()
+                install_file(self.snapshot_file)
+                if SNAPSHOT_RETENTION > 1:
+                    write_file(generation_file(JOURNAL_FILE, 1), journal[:offset])
+                write_file(JOURNAL_FILE, journal[offset:])
+                self.records = journal[offset:].count(b"\n")
+        finally:
+            self.compacting = False
+
+    # Move every kept snapshot and journal one generation back, dropping the
+    # oldest
+    def rotate(self):
+        for generation in range(SNAPSHOT_RETENTION - 1, 0, -1):
+            names = (self.snapshot_file,) if generation == 1 else (self.snapshot_file, JOURNAL_FILE)
+            for name in names:
+                newer, older = generation_file(name, generation - 1), generation_file(name, generation)
+                if os.path.exists(newer):
+                    os.replace(newer, older)
+                elif os.path.exists(older):
+                    os.remove(older)
+
+    # Appends reach the OS on every save, but only the disk once synced
+    def sync(self):
+        with self.lock:
+            if os.path.exists(JOURNAL_FILE):
+                with open(JOURNAL_FILE, "a") as FILE:
+                    os.fsync(FILE.fileno())
+
+    def clear(self, data):
+        with self.lock:
+            write_file(self.snapshot_file, self.encode_snapshot(data))
+            for generation in range(SNAPSHOT_RETENTION):
+                for name in (self.snapshot_file, JOURNAL_FILE):
+                    path = generation_file(name, generation)
+                    if path != self.snapshot_file and os.path.exists(path):
+                        os.remove(path)
+            self.records = 0
+
+# Messages are updated in place so the channel or dm keeps sharing the record
+def apply_record(data, record, positions):
+    table, key, value = record['table'], record['key'], record['value']
+    if table == 'messages':
+        if key in positions:
+            data['messages'][positions[key]].assign_record(value)
+        else:
+            message = Message.from_record(value)
+            positions[key] = len(data['messages'])
+            data['messages'].append(message)
+            container = message_container(data, message)
+            if container is not None:
+                container['messages'].append(message)
+    elif value is None:
+        data[table].pop(key, None)
+    elif table in ('users', 'jobs', 'stats'):
+        data[table][key] = RECORDS[table].from_record(value)
+    else:
+        existing = data[table].get(key)
+        container = RECORDS[table].from_record(value)
+        container['messages'] = existing['messages'] if existing is not None else []
+        data[table][key] = container
+
+# Build the data dictionary from a snapshot of any version. json turns the
+# integer ids used as dictionary keys into strings, they are turned back into
+# the types in KEYS so lookups and replayed records land on the same entries
+def decode_snapshot(snapshot):
+    version = snapshot.pop('version', 0)
+    if version > SCHEMA_VERSION:
+        raise ValueError(f"Snapshot version {version} is newer than this server understands")
+    for migrate in MIGRATIONS[version:]:
+        snapshot = migrate(snapshot)
+
+    data = empty_data()
+    for table, key_type in KEYS.items():
+        data[table] = {key_type(key): RECORDS[table].from_record(value) for key, value in snapshot[table].items()}
+    data['messages'] = [Message.from_record(message) for message in snapshot['messages']]
+    return data
+
+# Version 0 is the data.json written before snapshots were versioned. Channels
+# and dms held copies of their messages (data['messages'] has the same ones),
+# standups had no buffer of messages and there were no jobs
+def migrate_0(snapshot):
+    for table in ('channels', 'dms'):
+        for container in snapshot[table].values():
+            container.pop('messages', None)
+    for channel in snapshot['channels'].values():
+        channel['standup'].setdefault('messages', [])
+    snapshot.setdefault('jobs', {})
+    return snapshot
+
+# Version 1 kept no history of the workspace totals for users/stats
+def migrate_1(snapshot):
+    snapshot.setdefault('stats', {})
+    return snapshot
+
+# MIGRATIONS[version] upgrades a snapshot of that version to the next one
+MIGRATIONS = [migrate_0, migrate_1]
+
+###############################################################################
+#                                   BINARY                                    #
+###############################################################################
+
+# A binary snapshot is a header, every record and then an index of where each
+# table's records start. Each record is its length and crc32 followed by its
+# json ([key, value] for keyed tables, the value for messages).
+#
+# The file is memory mapped and decoded one record at a time, so loading never
+# holds the json of the whole store at once, only the records built from it.
+# The records of a table can be found without reading the ones before them,
+# messages are decoded last as their channels and dms must exist first.
+#
+# The text of messages isn't part of their records but follows them as utf-8,
+# along with where each one starts. Loading only checks its crc32, the
+# messages are frozen into the mapping (like a segment, see src/segments.py)
+# and each text is decoded when it's next read
+BINARY_SNAPSHOT_FILE = "data.snap"
+BINARY_MAGIC = b"ECHOSNAP"
+# Magic, schema version, offset and length of the index
+BINARY_HEADER = struct.Struct("<8sIQQ")
+# Length and crc32 of a record's json
+BINARY_RECORD = struct.Struct("<II")
+# Where a message's text starts
+BINARY_OFFSET = struct.Struct("<Q")
+
+def encode_binary_snapshot(data):
+    encoded = encode_data(data)
+    texts = [value.pop('message').encode() for value in encoded['messages']]
+    chunks, offset, index = [], BINARY_HEADER.size, {}
+    for table in list(KEYS) + ['messages']:
+        if table == 'messages':
+            payloads = [dumps(value) for value in encoded[table]]
+        else:
+            payloads = [dumps([key, value]) for key, value in encoded[table].items()]
+        index[table] = [offset, len(payloads)]
+        for payload in payloads:
+            chunks.append(BINARY_RECORD.pack(len(payload), zlib.crc32(payload)))
+            chunks.append(payload)
+            offset += BINARY_RECORD.size + len(payload)
+
+    # The texts, then the offset of each one and of the end of the last
+    starts, start = [], offset
+    for text in texts:
+        starts.append(BINARY_OFFSET.pack(start))
+        start += len(text)
+    starts.append(BINARY_OFFSET.pack(start))
+    region = b"".join(texts) + b"".join(starts)
+    index['texts'] = [offset, start, zlib.crc32(region)]
+    chunks.append(region)
+    offset += len(region)
+    index = dumps(index)
+    return BINARY_HEADER.pack(BINARY_MAGIC, SCHEMA_VERSION, offset, len(index)) + b"".join(chunks) + index
+
+# The mapping stays open for as long as messages read their text from it
+def read_binary_snapshot(path):
+    with open(path, "rb") as FILE:
+        view = mmap.mmap(FILE.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        data = decode_binary_snapshot(path, view)
+    except struct.error as error:
+        view.close()
+        # A header or record runs past the end of the file
+        raise ValueError(f"{path} is truncated") from error
+    except Exception:
+        view.close()
+        raise
+    return attach_messages(data)
+
+def decode_binary_snapshot(path, view):
+    magic, version, index_offset, index_length = BINARY_HEADER.unpack_from(view, 0)
+    if magic != BINARY_MAGIC:
+        raise ValueError(f"{path} isn't a binary snapshot")
+    if version > SCHEMA_VERSION:
+        raise ValueError(f"Snapshot version {version} is newer than this server understands")
+    index = loads(view[index_offset:index_offset + index_length])
+
+    # Versions since binary snapshots were added only brought new tables,
+    # which an older snapshot has no records of
+    data = empty_data()
+    for table, key_type in KEYS.items():
+        if table not in index:
+            continue
+        for key, value in read_binary_records(view, *index[table]):
+            data[table][key_type(key)] = RECORDS[table].from_record(value)
+    if 'texts' not in index:
+        data['messages'] = [Message.from_record(value) for value in read_binary_records(view, *index['messages'])]
+        view.close()
+        return data
+
+    offset, end, checksum = index['texts']
+    count = index['messages'][1]
+    if zlib.crc32(view[offset:end + (count + 1) * BINARY_OFFSET.size]) != checksum:
+        raise ValueError(f"Damaged message text at offset {offset}")
+    texts = MappedTexts(view, end)
+    for position, value in enumerate(read_binary_records(view, *index['messages'])):
+        message = Message.from_record(dict(value, message=None))
+        message.freeze(texts, position)
+        data['messages'].append(message)
+    return data
+
+def read_binary_records(view, offset, count):
+    for _ in range(count):
+        length, checksum = BINARY_RECORD.unpack_from(view, offset)
+        offset += BINARY_RECORD.size
+        payload = view[offset:offset + length]
+        if zlib.crc32(payload) != checksum:
+            raise ValueError(f"Damaged record at offset {offset}")
+        offset += length
+        yield loads(payload)
+
+# The text of the messages of a binary snapshot, read from its mapping as
+# Message.sent_message needs it
+class MappedTexts:
+    def __init__(self, view, offsets):
+        self.view = view
+        self.offsets = offsets
+
+    def text(self, index):
+        start, = BINARY_OFFSET.unpack_from(self.view, self.offsets + index * BINARY_OFFSET.size)
+        end, = BINARY_OFFSET.unpack_from(self.view, self.offsets + (index + 1) * BINARY_OFFSET.size)
+        return self.view[start:end].decode()
+
+# The journal engine with binary snapshots
+class BinaryJournalStorage(JournalStorage):
+    snapshot_file = BINARY_SNAPSHOT_FILE
+    encode_snapshot = staticmethod(encode_binary_snapshot)
+    read_snapshot = staticmethod(read_binary_snapshot)
+
+###############################################################################
+#                                   SQLITE                                    #
+###############################################################################
+
+SCHEMA = '''
+-- seq is the order users, channels and dms were created in, which their ids
+-- don't follow
+CREATE TABLE IF NOT EXISTS users (
+    seq INTEGER PRIMARY KEY,
+    u_id INTEGER UNIQUE,
+    name_first TEXT,
+    name_last TEXT,
+    email TEXT,
+    password TEXT,
+    handle_str TEXT,
+    permission_id INTEGER,
+    is_removed INTEGER
+);
+CREATE INDEX IF NOT EXISTS users_email ON users (email);
+CREATE INDEX IF NOT EXISTS users_handle ON users (handle_str);
+
+-- Session ids use the full unsigned 64 bits, more than an INTEGER holds
+CREATE TABLE IF NOT EXISTS sessions (
+    u_id INTEGER,
+    session_id TEXT,
+    PRIMARY KEY (u_id, session_id)
+);
+
+-- A notification's position is its number, see Notifications in src/records.py
+CREATE TABLE IF NOT EXISTS notifications (
+    u_id INTEGER,
+    position INTEGER,
+    channel_id INTEGER,
+    dm_id INTEGER,
+    notification_message TEXT,
+    PRIMARY KEY (u_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS channels (
+    seq INTEGER PRIMARY KEY,
+    channel_id INTEGER UNIQUE,
+    name TEXT,
+    is_public INTEGER,
+    standup_is_active INTEGER,
+    standup_time_finish INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS channel_members (
+    channel_id INTEGER,
+    is_owner INTEGER,
+    position INTEGER,
+    u_id INTEGER,
+    PRIMARY KEY (channel_id, is_owner, position)
+);
+CREATE INDEX IF NOT EXISTS channel_members_user ON channel_members (u_id);
+
+-- Lines buffered by a channel's active standup
+CREATE TABLE IF NOT EXISTS standup_messages (
+    channel_id INTEGER,
+    position INTEGER,
+    message TEXT,
+    PRIMARY KEY (channel_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS dms (
+    seq INTEGER PRIMARY KEY,
+    dm_id INTEGER UNIQUE,
+    name TEXT
+);
+
+CREATE TABLE IF NOT EXISTS dm_members (
+    dm_id INTEGER,
+    position INTEGER,
+    u_id INTEGER,
+    PRIMARY KEY (dm_id, position)
+);
+CREATE INDEX IF NOT EXISTS dm_members_user ON dm_members (u_id);
+
+CREATE TABLE IF NOT EXISTS messages (
+    seq INTEGER PRIMARY KEY,
+    message_id INTEGER UNIQUE,
+    u_id INTEGER,
+    message TEXT,
+    time_created INTEGER,
+    channel_id INTEGER,
+    dm_id INTEGER,
+    is_removed INTEGER,
+    was_shared INTEGER,
+    is_pinned INTEGER
+);
+CREATE INDEX IF NOT EXISTS messages_channel ON messages (channel_id, seq);
+CREATE INDEX IF NOT EXISTS messages_dm ON messages (dm_id, seq);
+CREATE INDEX IF NOT EXISTS messages_user ON messages (u_id);
+
+-- A job's args are kept as json, they differ between kinds of job
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY,
+    kind TEXT,
+    time REAL,
+    args TEXT
+);
+
+CREATE TABLE IF NOT EXISTS stats (
+    position INTEGER PRIMARY KEY,
+    time_stamp INTEGER,
+    num_channels_exist INTEGER,
+    num_dms_exist INTEGER,
+    num_messages_exist INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS reacts (
+    message_id INTEGER,
+    position INTEGER,
+    react_id INTEGER,
+    u_id INTEGER,
+    PRIMARY KEY (message_id, position, u_id)
+);
+'''
+
+# Tables given a seq column after they were first created, and their columns
+# before it. A database from then is copied over in id order on connecting,
+# the indexes dropped along with the old tables are made again by SCHEMA
+SEQUENCED = {
+    'users': 'u_id, name_first, name_last, email, password, handle_str, permission_id, is_removed',
+    'channels': 'channel_id, name, is_public, standup_is_active, standup_time_finish',
+    'dms': 'dm_id, name',
+}
+
+TABLES = ['users', 'sessions', 'notifications', 'channels', 'channel_members', 'standup_messages',
+          'dms', 'dm_members', 'messages', 'reacts', 'jobs', 'stats']
+
+# Stores every entity as rows, so a change only rewrites the rows belonging to
+# the entities that were touched
+class SqliteStorage:
+    def __init__(self, path=DATABASE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.add_sequence(self.connection)
+            self.connection.executescript(SCHEMA)
+        return self.connection
+
+    def add_sequence(self, db):
+        with db:
+            for table, columns in SEQUENCED.items():
+                existing = [row[1] for row in db.execute(f'PRAGMA table_info({table})')]
+                if not existing or 'seq' in existing:
+                    continue
+                db.execute(f'ALTER TABLE {table} RENAME TO {table}_unsequenced')
+                db.executescript(SCHEMA)
+                db.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_unsequenced ORDER BY rowid')
+                db.execute(f'DROP TABLE {table}_unsequenced')
+
+    def load(self):
+        with self.lock:
+            db = self.connect()
+            data = empty_data()
+
+            for row in db.execute('SELECT * FROM users ORDER BY seq'):
+                _, u_id, name_first, name_last, email, password, handle_str, permission_id, is_removed = row
+                data['users'][u_id] = User(name_first, name_last, email, password, handle_str,
+                                           permission_id, is_removed=bool(is_removed))
+            for u_id, session_id in db.execute('SELECT u_id, session_id FROM sessions'):
+                data['users'][u_id]['sessions'].add(int(session_id))
+            for u_id, position, channel_id, dm_id, notification_message in db.execute(
+                    'SELECT u_id, position, channel_id, dm_id, notification_message FROM notifications ORDER BY u_id, position'):
+                data['users'][u_id]['notifications'].append(
+                    Notification(channel_id, dm_id, notification_message), position)
+
+            for _, channel_id, name, is_public, is_active, time_finish in db.execute('SELECT * FROM channels ORDER BY seq'):
+                data['channels'][channel_id] = Channel(name, bool(is_public), standup={
+                    'is_active' : bool(is_active),
+                    'time_finish' : time_finish,
+                    'messages' : [],
+                })
+            for channel_id, is_owner, u_id in db.execute(
+                    'SELECT channel_id, is_owner, u_id FROM channel_members ORDER BY channel_id, is_owner, position'):
+                role = 'owner_members' if is_owner else 'all_members'
+                data['channels'][channel_id][role].append(u_id)
+            for channel_id, message in db.execute(
+                    'SELECT channel_id, message FROM standup_messages ORDER BY channel_id, position'):
+                data['channels'][channel_id]['standup']['messages'].append(message)
+
+            for _, dm_id, name in db.execute('SELECT * FROM dms ORDER BY seq'):
+                data['dms'][dm_id] = Dm(name)
+            for dm_id, u_id in db.execute('SELECT dm_id, u_id FROM dm_members ORDER BY dm_id, position'):
+                data['dms'][dm_id]['members'].append(u_id)
+
+            reacts = {}
+            for message_id, position, react_id, u_id in db.execute(
+                    'SELECT message_id, position, react_id, u_id FROM reacts ORDER BY message_id, position, rowid'):
+                message_reacts = reacts.setdefault(message_id, [])
+                if len(message_reacts) <= position:
+                    message_reacts.append(React(react_id))
+                if u_id is not None:
+                    message_reacts[-1]['u_ids'].append(u_id)
+
+            for row in db.execute('SELECT * FROM messages ORDER BY seq'):
+                _, message_id, u_id, text, time_created, channel_id, dm_id, is_removed, was_shared, is_pinned = row
+                data['messages'].append(Message(
+                    message_id, u_id, text, time_created,
+                    channel_id=channel_id,
+                    dm_id=dm_id,
+                    reacts=reacts.get(message_id, []),
+                    is_pinned=bool(is_pinned),
+                    is_removed=bool(is_removed),
+                    was_shared=bool(was_shared),
+                ))
+
+            for job_id, kind, when, args in db.execute('SELECT * FROM jobs'):
+                data['jobs'][job_id] = Job(kind, when, loads(args))
+            for position, *totals in db.execute('SELECT * FROM stats ORDER BY position'):
+                data['stats'][position] = Totals(*totals)
+            return attach_messages(data)
+
+    def save(self, records, data):
+        with self.lock:
+            db = self.connect()
+            with db:
+                for record in records:
+                    if record['table'] == 'users':
+                        self.save_user(db, record['key'], record['value'])
+                    elif record['table'] == 'channels':
+                        self.save_channel(db, record['key'], record['value'])
+                    elif record['table'] == 'dms':
+                        self.save_dm(db, record['key'], record['value'])
+                    elif record['table'] == 'messages':
+                        self.save_message(db, record['key'], record['value'])
+                    elif record['table'] == 'jobs':
+                        self.save_job(db, record['key'], record['value'])
+                    elif record['table'] == 'stats':
+                        self.save_totals(db, record['key'], record['value'])
+
+    def save_user(self, db, u_id, user):
+        db.execute('DELETE FROM sessions WHERE u_id = ?', (u_id,))
+        db.execute('DELETE FROM notifications WHERE u_id = ?', (u_id,))
+        if user is None:
+            db.execute('DELETE FROM users WHERE u_id = ?', (u_id,))
+            return
+        # Upserts keep a row's seq, see save_message
+        db.execute('''INSERT INTO users (u_id, name_first, name_last, email, password, handle_str,
+                          permission_id, is_removed)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                      ON CONFLICT (u_id) DO UPDATE SET
+                          name_first = excluded.name_first, name_last = excluded.name_last,
+                          email = excluded.email, password = excluded.password,
+                          handle_str = excluded.handle_str, permission_id = excluded.permission_id,
+                          is_removed = excluded.is_removed''', (
+            u_id, user['name_first'], user['name_last'], user['email'], user['password'],
+            user['handle_str'], user['permission_id'], user['is_removed']))
+        db.executemany('INSERT OR IGNORE INTO sessions VALUES (?, ?)',
+            [(u_id, str(session_id)) for session_id in user['sessions']])
+        db.executemany('INSERT INTO notifications VALUES (?, ?, ?, ?, ?)',
+            [(u_id, notification['sequence'], notification['channel_id'], notification['dm_id'],
+              notification['notification_message'])
+             for notification in user['notifications']])
+
+    def save_channel(self, db, channel_id, channel):
+        db.execute('DELETE FROM channel_members WHERE channel_id = ?', (channel_id,))
+        db.execute('DELETE FROM standup_messages WHERE channel_id = ?', (channel_id,))
+        if channel is None:
+            db.execute('DELETE FROM channels WHERE channel_id = ?', (channel_id,))
+            return
+        db.execute('''INSERT INTO channels (channel_id, name, is_public, standup_is_active,
+                          standup_time_finish)
+                      VALUES (?, ?, ?, ?, ?)
+                      ON CONFLICT (channel_id) DO UPDATE SET
+                          name = excluded.name, is_public = excluded.is_public,
+                          standup_is_active = excluded.standup_is_active,
+                          standup_time_finish = excluded.standup_time_finish''', (
+            channel_id, channel['name'], channel['is_public'],
+            channel['standup']['is_active'], channel['standup']['time_finish']))
+        db.executemany('INSERT INTO channel_members VALUES (?, ?, ?, ?)',
+            [(channel_id, True, position, u_id) for position, u_id in enumerate(channel['owner_members'])] +
+            [(channel_id, False, position, u_id) for position, u_id in enumerate(channel['all_members'])])
+        db.executemany('INSERT INTO standup_messages VALUES (?, ?, ?)',
+            [(channel_id, position, message) for position, message in enumerate(channel['standup'].get('messages', []))])
+
+    def save_dm(self, db, dm_id, dm):
+        db.execute('DELETE FROM dm_members WHERE dm_id = ?', (dm_id,))
+        if dm is None:
+            db.execute('DELETE FROM dms WHERE dm_id = ?', (dm_id,))
+            return
+        db.execute('''INSERT INTO dms (dm_id, name) VALUES (?, ?)
+                      ON CONFLICT (dm_id) DO UPDATE SET name = excluded.name''', (dm_id, dm['name']))
+        db.executemany('INSERT INTO dm_members VALUES (?, ?, ?)',
+            [(dm_id, position, u_id) for position, u_id in enumerate(dm['members'])])
+
+    def save_message(self, db, message_id, message):
+        db.execute('DELETE FROM reacts WHERE message_id = ?', (message_id,))
+        if message is None:
+            db.execute('DELETE FROM messages WHERE message_id = ?', (message_id,))
+            return
+        # Upsert rather than replace so the message keeps its place (seq) in
+        # the global ordering
+        db.execute('''INSERT INTO messages (message_id, u_id, message, time_created, channel_id,
+                          dm_id, is_removed, was_shared, is_pinned)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                      ON CONFLICT (message_id) DO UPDATE SET
+                          message = excluded.message, is_removed = excluded.is_removed,
+                          was_shared = excluded.was_shared, is_pinned = excluded.is_pinned''', (
+            message_id, message['u_id'], message['message'], message['time_created'],
+            message['channel_id'], message['dm_id'], message['is_removed'],
+            message['was_shared'], message['is_pinned']))
+
+        # A react nobody is left on is kept as a single row without a u_id
+        rows = []
+        for position, react in enumerate(message['reacts']):
+            u_ids = react['u_ids'] if react['u_ids'] else [None]
+            rows += [(message_id, position, react['react_id'], u_id) for u_id in u_ids]
+        db.executemany('INSERT OR IGNORE INTO reacts VALUES (?, ?, ?, ?)', rows)
+
+    def save_job(self, db, job_id, job):
+        if job is None:
+            db.execute('DELETE FROM jobs WHERE job_id = ?', (job_id,))
+            return
+        db.execute('INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?)',
+            (job_id, job['kind'], job['time'], dumps(job['args']).decode()))
+
+    def save_totals(self, db, position, totals):
+        if totals is None:
+            db.execute('DELETE FROM stats WHERE position = ?', (position,))
+            return
+        db.execute('INSERT OR REPLACE INTO stats VALUES (?, ?, ?, ?, ?)', (
+            position, totals['time_stamp'], totals['num_channels_exist'],
+            totals['num_dms_exist'], totals['num_messages_exist']))
+
+    # Every row is already on disk, so a snapshot only needs to reclaim space
+    def snapshot(self, data):
+        with self.lock:
+            self.connect().execute('VACUUM')
+
+    # sqlite syncs every transaction as it commits
+    def sync(self):
+        pass
+
+    def clear(self, data):
+        with self.lock:
+            db = self.connect()
+            with db:
+                for table in TABLES:
+                    db.execute(f'DELETE FROM {table}')
+
+ENGINES = {
+    'memory': MemoryStorage,
+    'journal': JournalStorage,
+    'binary': BinaryJournalStorage,
+    'sqlite': SqliteStorage,
+}
+
+def create_storage(engine):
+    return ENGINES[engine]()
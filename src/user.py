@@ -1,10 +1,9 @@
 # PROJECT-BACKEND: Team Echo
 # Written by Winston Lin
 
-from src.data import data, retrieve_data
+from src.data import data, retrieve_data, mark_dirty, count_messages_sent_by, count_live_messages, count_memberships, involved_users, totals_history, email_index, handle_index, set_user_email, set_user_handle
 from src.error import AccessError, InputError
 from src.auth import auth_token_ok, auth_decode_token, auth_email_format
-from datetime import datetime
 
 import requests
 import imgspy
@@ -92,6 +91,7 @@ def user_profile_setname_v2(token, name_first, name_last):
 
     data['users'][auth_user_id]['name_last'] = name_last
     data['users'][auth_user_id]['name_first'] = name_first
+    mark_dirty('users', auth_user_id)
 
     return {}
 
@@ -124,12 +124,12 @@ def user_profile_setemail_v2(token, new_email):
         raise InputError('invalid email format')
 
     # if email already used by another user 
-    if any(user['email'] == new_email for user in data['users'].values()):
+    if new_email in email_index:
         raise InputError('email already exists') 
 
     auth_user_id = auth_decode_token(token)
 
-    data['users'][auth_user_id]['email'] = new_email
+    set_user_email(auth_user_id, new_email)
 
     return {}
 
@@ -158,7 +158,7 @@ def user_profile_sethandle_v2(token, new_handle):
         raise InputError('invalid token')
 
     # if email already used by another user 
-    if any(user['handle_str'] == new_handle for user in data['users'].values()):
+    if new_handle in handle_index:
         raise InputError('handle already exists') 
            
     # check handle format
@@ -167,7 +167,7 @@ def user_profile_sethandle_v2(token, new_handle):
 
     auth_user_id = auth_decode_token(token)
 
-    data['users'][auth_user_id]['handle_str'] = new_handle
+    set_user_handle(auth_user_id, new_handle)
 
     return {}
 
@@ -289,35 +289,18 @@ def user_stats_v1(token):
 
     user_id = auth_decode_token(token)
 
-    # Token is valid, continue to gather statistics about this user
-
-    # Channels joined statistic
-    channel_num = 0
-    total_ch = 0
-    for channel in data['channels']:
-        for member in data['channels'][channel]['all_members']:
-            if member == user_id:
-                channel_num += 1
-
-        
-        total_ch += 1
+    # Token is valid, continue to gather statistics about this user. Each
+    # count is kept up to date as users join, leave and send (src/data.py)
 
-    # Dms joined statistic
-    dm_num = 0
-    total_dm = 0
-    for dm in data['dms']:
-        for member in data['dms'][dm]['members']:
-            if member == user_id:
-                dm_num += 1
-        total_dm += 1
+    # Channels and dms joined statistic
+    channel_num = count_memberships('channels', user_id)
+    dm_num = count_memberships('dms', user_id)
+    total_ch = len(data['channels'])
+    total_dm = len(data['dms'])
 
     # Messages sent statistic
-    msg_num = 0
-    total_msg = 0
-    for msg in data['messages']:
-        if msg['u_id'] == user_id:
-            msg_num += 1
-        total_msg += 1
+    msg_num = count_messages_sent_by(user_id)
+    total_msg = count_live_messages()
 
     # Calculate involvement
     activity = channel_num + dm_num + msg_num
@@ -361,39 +344,15 @@ def users_stats_v1(token):
 
     # Token is valid, continue to gather statistics about this user
 
-    # To calculate involvement, get total users and create a list to track
-    # users we encounter involved in channels/dms
-    total_users = len(data['users'])
-    userdex = []
-
-    # Total channels statistic
-    total_ch = 0
-    for channel in data['channels']:
-        for member in data['channels'][channel]['all_members']:
-            if member not in userdex:
-                userdex.append(member)
-        total_ch += 1
-
-    # Total dms statistic
-    total_dm = 0
-    for dm in data['dms']:
-        for member in data['dms'][dm]['members']:
-            if member not in userdex:
-                userdex.append(member)
-        total_dm += 1
-
-    # Messages sent statistic
-    total_msg = len(data['messages'])
-
-    # Calculate utilization
-    utilization = (len(userdex) / total_users)
+    # Utilization counts the users in at least one channel or dm
+    utilization = (len(involved_users) / len(data['users']))
     
-    # Create dict for stats
-    time_stamp = round(datetime.now().timestamp())
+    # Create dict for stats. The history of each total is kept as channels
+    # and dms are created and removed and messages sent and removed (src/data.py)
     dreams_stats = {
-        'channels_exist': [{'num_channels_exist': total_ch,'time_stamp': time_stamp}],
-        'dms_exist': [{'num_dms_exist': total_dm,'time_stamp': time_stamp}],
-        'messages_exist': [{'num_messages_exist': total_msg,'time_stamp': time_stamp}],
+        'channels_exist': totals_history('num_channels_exist'),
+        'dms_exist': totals_history('num_dms_exist'),
+        'messages_exist': totals_history('num_messages_exist'),
         'utilization_rate': utilization,
     }
 
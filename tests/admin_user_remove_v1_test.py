@@ -8,7 +8,8 @@ from src.channels import channels_create_v2
 from src.error import InputError, AccessError
 from src.dm import dm_create_v1, dm_messages_v1, dm_details_v1, dm_invite_v1
 from src.message import message_send_v2, message_senddm_v1
-from src.other import admin_user_remove_v1, admin_userpermission_change_v1
+from src.other import admin_user_remove_v1, admin_userpermission_change_v1, search_v2
+from src.data import read_data, write_data
 from src.user import user_profile_v2
 
 ######################### Tests admin_user_remove ########################
@@ -154,4 +155,26 @@ def test_admin_user_remove_testing_admin_input_error(setup_user):
         admin_user_remove_v1(users['user3']['token'], users['user2']['auth_user_id'])
     
     with pytest.raises(InputError):
-        admin_userpermission_change_v1(users['user3']['token'], users['user2']['auth_user_id'], 1)
\ No newline at end of file
+        admin_userpermission_change_v1(users['user3']['token'], users['user2']['auth_user_id'], 1)
+
+
+# Asserts that search_v2 finds a removed user's messages by 'Removed user' only,
+# before and after the store is reloaded
+def test_admin_user_remove_search(setup_user):
+    users = setup_user
+
+    channel_id1 = channels_create_v2(users['user1']['token'], 'Test Channel', True)
+    channel_join_v2(users['user2']['token'], channel_id1['channel_id'])
+    message_id1 = message_send_v2(users['user2']['token'], channel_id1['channel_id'], "hello there")
+    message_id2 = message_send_v2(users['user1']['token'], channel_id1['channel_id'], "hello back")
+
+    admin_user_remove_v1(users['user1']['token'], users['user2']['auth_user_id'])
+
+    for _ in range(2):
+        hello = search_v2(users['user1']['token'], "hello")['messages']
+        assert [message['message_id'] for message in hello] == [message_id2['message_id']]
+        removed = search_v2(users['user1']['token'], "Removed")['messages']
+        assert [message['message_id'] for message in removed] == [message_id1['message_id']]
+        assert removed[0]['message'] == 'Removed user'
+        write_data()
+        read_data()
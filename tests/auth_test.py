@@ -3,10 +3,13 @@
 
 import pytest
 
+import src.auth
+
 from src.error import InputError
 from src.auth import auth_login_v1, auth_email_format, auth_register_v1, auth_encode_token, auth_decode_token, auth_token_ok, auth_logout_v1, auth_get_token_session, auth_passwordreset_request, auth_passwordreset_reset, auth_send_reset_email
 from src.data import retrieve_data
-from src.other import clear_v1
+from src.other import clear_v1, admin_user_remove_v1
+from src.user import user_profile_sethandle_v2
 import time
 import threading
 
@@ -141,6 +144,68 @@ def test_auth_logout_logging_back(test_users):
     assert auth_token_ok(resp_login['token']) == True
 
 
+def test_auth_token_cache(test_users):
+    token = test_users['login1']['token']
+    assert auth_token_ok(token) == True
+    assert token in src.auth.tokenCache
+
+    # logging out forgets the token and the session
+    auth_logout_v1(token)
+    assert token not in src.auth.tokenCache
+    assert auth_token_ok(token) == False
+
+
+def test_auth_token_cache_bounded(test_users, monkeypatch):
+    monkeypatch.setattr(src.auth, 'TOKEN_CACHE_SIZE', 2)
+    src.auth.tokenCache.clear()
+    for login in ('login1', 'login2', 'login3'):
+        assert auth_token_ok(test_users[login]['token']) == True
+
+    assert list(src.auth.tokenCache) == [test_users['login2']['token'], test_users['login3']['token']]
+    assert auth_decode_token(test_users['login1']['token']) == test_users['login1']['auth_user_id']
+
+
+def test_auth_token_unhashable(test_users):
+    # tokens from a json body may be lists or dicts, they are simply invalid
+    assert auth_token_ok(['token']) == False
+    assert auth_token_ok({'token': test_users['login1']['token']}) == False
+
+
+def test_auth_register_handle_after_sethandle(test_users):
+    # a handle taken through sethandle is skipped by the suffix counter
+    bob = auth_register_v1('bob1@email.com', 'password1', 'bob', 'builder')
+    user_profile_sethandle_v2(test_users['login1']['token'], 'bobbuilder1')
+    bob0 = auth_register_v1('bob2@email.com', 'password1', 'bob', 'builder')
+    bob2 = auth_register_v1('bob3@email.com', 'password1', 'bob', 'builder')
+
+    data = retrieve_data()
+    assert data['users'][bob['auth_user_id']]['handle_str'] == 'bobbuilder'
+    assert data['users'][bob0['auth_user_id']]['handle_str'] == 'bobbuilder0'
+    assert data['users'][bob2['auth_user_id']]['handle_str'] == 'bobbuilder2'
+
+
+def test_auth_register_handle_freed(test_users):
+    # a numbered handle given up through sethandle is handed out again first
+    auth_register_v1('bob1@email.com', 'password1', 'bob', 'builder')
+    bob0 = auth_register_v1('bob2@email.com', 'password1', 'bob', 'builder')
+    auth_register_v1('bob3@email.com', 'password1', 'bob', 'builder')
+    user_profile_sethandle_v2(bob0['token'], 'theboss')
+    bob = auth_register_v1('bob4@email.com', 'password1', 'bob', 'builder')
+    bob2 = auth_register_v1('bob5@email.com', 'password1', 'bob', 'builder')
+
+    data = retrieve_data()
+    assert data['users'][bob['auth_user_id']]['handle_str'] == 'bobbuilder0'
+    assert data['users'][bob2['auth_user_id']]['handle_str'] == 'bobbuilder2'
+
+
+def test_auth_removed_user_frees_email(test_users):
+    admin_user_remove_v1(test_users['login1']['token'], test_users['login2']['auth_user_id'])
+
+    with pytest.raises(InputError):
+        auth_login_v1('user2@email.com', 'User2_pass!')
+    assert auth_register_v1('user2@email.com', 'User2_pass!', 'user2_first', 'user2_last')
+
+
 def test_auth_passwordreset_request(test_users):
     auth_register_v1('doriw35476@shzsedu.com', 'password1', 'bob', 'builder')
     auth_passwordreset_request('doriw35476@shzsedu.com')
@@ -9,7 +9,8 @@ from src.auth import auth_register_v1
 from src.channels import channels_create_v2
 from src.channel import channel_invite_v2
 from src.channel import channel_details_v2
-from src.other import clear_v1
+from src.other import clear_v1, admin_userpermission_change_v1
+from src.data import retrieve_data, read_data, write_data
 
 @pytest.fixture(autouse=True)
 def reset():
@@ -233,4 +234,21 @@ def test_invalid_token():
 
     ch_id = channels_create_v2(a_u_id1["token"], 'channel1', True) #returns channel_id1 e.g.
     with pytest.raises(AccessError):
-        channel_invite_v2(12345, ch_id['channel_id'], a_u_id2['auth_user_id'])
\ No newline at end of file
+        channel_invite_v2(12345, ch_id['channel_id'], a_u_id2['auth_user_id'])
+
+# A member who has become a global owner is made a channel owner when invited
+# again, and that is saved like any other change to the channel
+def test_invite_member_global_owner():
+    setup = setup_users()
+    a_u_id1, a_u_id2, a_u_id3 = setup['user1'], setup['user2'], setup['user3']
+
+    ch_id = channels_create_v2(a_u_id2["token"], 'channel1', True)['channel_id']
+    channel_invite_v2(a_u_id2["token"], ch_id, a_u_id3['auth_user_id'])
+    write_data()
+    admin_userpermission_change_v1(a_u_id1["token"], a_u_id3['auth_user_id'], 1)
+    channel_invite_v2(a_u_id2["token"], ch_id, a_u_id3['auth_user_id'])
+    write_data()
+
+    read_data()
+    assert list(retrieve_data()['channels'][ch_id]['owner_members']) == [
+        a_u_id2['auth_user_id'], a_u_id3['auth_user_id']]
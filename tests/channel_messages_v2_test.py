@@ -7,7 +7,7 @@ from src.error import InputError, AccessError
 from src.channel import channel_messages_v2, channel_invite_v2
 from src.auth import auth_register_v1
 from src.channels import channels_create_v2
-from src.message import message_send_v2
+from src.message import message_send_v2, message_remove_v1
 from src.other import clear_v1
 
 
@@ -408,6 +408,28 @@ def test_channel_messages_v2_start_21_end_neg1(set_up_data):
     assert messages_list['messages'][28]["message"] == "1"
 
 
+
+# Removed messages are skipped and the following pages shift to fill the gap
+def test_channel_messages_v2_removed_messages(set_up_data):
+    setup = set_up_data
+    user1, user2, channel1 = setup['user1'], setup['user2'], setup['channel1']
+    add_x_messages(user1, user2, channel1, 60)
+    
+    # Remove the 5 most recent messages ("56" to "60") and message "30"
+    messages_list = channel_messages_v2(user1["token"], channel1, 0)
+    for message in messages_list['messages'][0:5] + [messages_list['messages'][30]]:
+        message_remove_v1(user1["token"], message['message_id'])
+
+    messages_list = channel_messages_v2(user1["token"], channel1, 0)
+    assert len(messages_list['messages']) == 50
+    assert messages_list['messages'][0]["message"] == "55"
+    assert messages_list['messages'][24]["message"] == "31"
+    assert messages_list['messages'][25]["message"] == "29"
+
+    messages_list = channel_messages_v2(user1["token"], channel1, 50)
+    assert [message["message"] for message in messages_list['messages']] == ["4", "3", "2", "1"]
+    assert messages_list['end'] == -1
+
 ###############################################################################
 #                               HELPER FUNCTIONS                              #
 ###############################################################################
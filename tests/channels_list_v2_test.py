@@ -8,7 +8,7 @@ from src.error import InputError
 from src.error import AccessError
 
 from src.auth import auth_register_v1
-from src.channel import channel_join_v1, channel_details_v2
+from src.channel import channel_join_v1, channel_details_v2, channel_leave_v1
 from src.channels import channels_create_v2, channels_list_v2
 from src.other import clear_v1
 
@@ -189,6 +189,33 @@ def test_multiple_channels_mixed():
         ],
     }
 
+#Case where channels are joined out of order and left, listed in the order they were created
+def test_join_order_leave():
+    clear_v1()
+    a_u_id1 = auth_register_v1('temp1@gmail.com','password1','first1','last1') #auth_user_id1 created
+    a_u_id2 = auth_register_v1('temp2@gmail.com','password2','first2','last2') #auth_user_id2 created
+    chid1 = channels_create_v2(a_u_id1['token'], 'channel1', True) #Public channel created
+    chid2 = channels_create_v2(a_u_id1['token'], 'channel2', True) #Public channel created
+    chid3 = channels_create_v2(a_u_id1['token'], 'channel3', True) #Public channel created
+    channel_join_v1(a_u_id2['auth_user_id'], chid3['channel_id'])
+    channel_join_v1(a_u_id2['auth_user_id'], chid2['channel_id'])
+    channel_join_v1(a_u_id2['auth_user_id'], chid1['channel_id'])
+    channel_leave_v1(a_u_id2['token'], chid2['channel_id'])
+
+    # Expect a list containing channels 1 and 3
+    assert channels_list_v2(a_u_id2['token']) == {
+        'channels': [
+            {
+                'channel_id': chid1['channel_id'],
+                'name': 'channel1',
+            },
+            {
+                'channel_id': chid3['channel_id'],
+                'name': 'channel3',
+            },
+        ],
+    }
+
 #Case where user is a member of no channels
 def test_memberless():
     clear_v1()
@@ -0,0 +1,21 @@
+# PROJECT-BACKEND: Team Echo
+
+from src.columns import MessageColumns
+from src.records import Message
+
+def make_columns(texts):
+    return MessageColumns([Message(row, row % 3, text, row, channel_id=1) for row, text in enumerate(texts)])
+
+def test_remove():
+    columns = make_columns(["a", "b", "c", "d"])
+    columns.remove(1)
+
+    assert len(columns) == 4
+    assert list(columns.is_removed) == [0, 1, 0, 0]
+
+def test_count_live():
+    columns = make_columns(["a", "b", "c"])
+    columns.remove(1)
+    columns.remove(1)
+
+    assert columns.count_live() == 2
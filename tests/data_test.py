@@ -0,0 +1,442 @@
+# PROJECT-BACKEND: Team Echo
+
+import json
+import time
+import pytest
+
+import src.data
+from src import config
+from src.data import retrieve_data, read_data, write_data, sync_data, snapshot_data, set_storage, start_flusher, stop_flusher
+from src.auth import auth_register_v1, auth_login_v1, auth_password_hash
+from src.channels import channels_create_v2, channels_list_v2, channels_listall_v2
+from src.message import message_send_v2, message_edit_v2, message_react_v1, message_remove_v1, message_sendlater_v1
+from src.channel import channel_invite_v2, channel_messages_v2
+from src.dm import dm_create_v1, dm_remove_v1
+from src.other import clear_v1, search_v2
+from src.user import users_all_v1, user_stats_v1, users_stats_v1, user_profile_setname_v2
+from src.records import Message, Members, to_json
+
+# Every test runs in its own directory so the data files never clash
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    clear_v1()
+    user1 = auth_register_v1('bob.builder@email.com', 'badpassword1', 'Bob', 'Builder')
+    user2 = auth_register_v1('shaun.sheep@email.com', 'password123', 'Shaun', 'Sheep')
+    channel1 = channels_create_v2(user1['token'], 'Channel1', True)['channel_id']
+    return {'user1': user1, 'user2': user2, 'channel1': channel1, 'path': tmp_path}
+
+# Mutations are appended to the journal and replayed on top of the snapshot
+def test_journal_replay(workspace):
+    user1, channel1 = workspace['user1'], workspace['channel1']
+    message_id = message_send_v2(user1['token'], channel1, "Hello")['message_id']
+    write_data()
+    message_edit_v2(user1['token'], message_id, "Hello again")
+    write_data()
+
+    assert (workspace['path'] / "data.log").exists()
+    before = retrieve_data()
+    read_data()
+    after = retrieve_data()
+
+    assert after == before
+    assert after['channels'][channel1]['messages'][0]['message'] == "Hello again"
+    assert after['messages'][0]['message'] == "Hello again"
+
+# A deleted entity is journaled as a tombstone and stays deleted after a reload
+def test_journal_delete(workspace):
+    user1, user2 = workspace['user1'], workspace['user2']
+    dm_id = dm_create_v1(user1['token'], [user2['auth_user_id']])['dm_id']
+    write_data()
+    dm_remove_v1(user1['token'], dm_id)
+    write_data()
+
+    read_data()
+    assert dm_id not in retrieve_data()['dms']
+
+# Snapshotting folds the journal into data.json and empties the log
+def test_snapshot_compacts_journal(workspace):
+    user1, channel1 = workspace['user1'], workspace['channel1']
+    message_send_v2(user1['token'], channel1, "Hello")
+    write_data()
+
+    snapshot_data()
+    assert (workspace['path'] / "data.log").read_text() == ""
+    assert src.data.storage.records == 0
+
+    read_data()
+    assert retrieve_data()['messages'][0]['message'] == "Hello"
+    assert channel1 in retrieve_data()['channels']
+
+# Older snapshots are kept along with the journals leading on from them, so a
+# damaged snapshot falls back to the one before
+def test_snapshot_damaged(workspace):
+    user1, channel1 = workspace['user1'], workspace['channel1']
+    message_send_v2(user1['token'], channel1, "Hello")
+    write_data()
+    snapshot_data()
+    message_send_v2(user1['token'], channel1, "Hello again")
+    write_data()
+    snapshot_data()
+    message_send_v2(user1['token'], channel1, "Goodbye")
+    write_data()
+
+    snapshot = workspace['path'] / "data.json"
+    snapshot.write_bytes(snapshot.read_bytes().replace(b"Hello again", b"Hello agaiN"))
+
+    read_data()
+    assert [message['message'] for message in retrieve_data()['messages']] == ["Hello", "Hello again", "Goodbye"]
+
+# Only the last few snapshots are kept, and loading fails loudly rather than
+# starting over when none of them is intact
+def test_snapshot_retention(workspace):
+    user1, channel1 = workspace['user1'], workspace['channel1']
+    for text in ["One", "Two", "Three", "Four"]:
+        message_send_v2(user1['token'], channel1, text)
+        write_data()
+        snapshot_data()
+
+    files = sorted(path.name for path in workspace['path'].iterdir())
+    assert files == ["data.json", "data.json.1", "data.json.2", "data.log", "data.log.1", "data.log.2"]
+
+    for name in ["data.json", "data.json.1", "data.json.2"]:
+        (workspace['path'] / name).write_text("0\n{}")
+    with pytest.raises(ValueError):
+        read_data()
+
+# A torn last record from a crash mid-append is ignored on replay
+def test_journal_partial_record(workspace):
+    user1, channel1 = workspace['user1'], workspace['channel1']
+    message_send_v2(user1['token'], channel1, "Hello")
+    write_data()
+    with open(workspace['path'] / "data.log", "a") as FILE:
+        FILE.write('{"table": "users", "ke')
+
+    read_data()
+    assert retrieve_data()['messages'][0]['message'] == "Hello"
+
+# Reads leave nothing to write, so the journal isn't touched
+def test_write_data_clean(workspace):
+    user1 = workspace['user1']
+    write_data()
+    journal = (workspace['path'] / "data.log").read_text()
+
+    users_all_v1(user1['token'])
+    user_stats_v1(user1['token'])
+    users_stats_v1(user1['token'])
+    channels_list_v2(user1['token'])
+    write_data()
+    assert (workspace['path'] / "data.log").read_text() == journal
+
+# The flusher writes changes out without anyone calling write_data(), as soon
+# as enough of them pile up
+def test_flusher(workspace, monkeypatch):
+    user1, channel1 = workspace['user1'], workspace['channel1']
+    monkeypatch.setattr(config, 'flush_interval', 60000)
+    monkeypatch.setattr(config, 'flush_threshold', 1)
+    sync_data()
+    start_flusher()
+    try:
+        message_send_v2(user1['token'], channel1, "Hello")
+        deadline = time.time() + 5
+        while "Hello" not in (workspace['path'] / "data.log").read_text() and time.time() < deadline:
+            time.sleep(0.01)
+        assert "Hello" in (workspace['path'] / "data.log").read_text()
+    finally:
+        stop_flusher()
+
+    read_data()
+    assert retrieve_data()['messages'][0]['message'] == "Hello"
+
+# A failed write keeps its batch for the next one, and doesn't stop the flusher
+def test_flusher_failure(workspace, monkeypatch):
+    user1, channel1 = workspace['user1'], workspace['channel1']
+    sync_data()
+    save = src.data.storage.save
+    def fail(records, data):
+        raise OSError("disk full")
+    monkeypatch.setattr(src.data.storage, 'save', fail)
+    message_send_v2(user1['token'], channel1, "Hello")
+    with pytest.raises(OSError):
+        write_data()
+
+    monkeypatch.setattr(config, 'flush_interval', 10)
+    start_flusher()
+    try:
+        time.sleep(0.1)
+        assert src.data.flusher.is_alive()
+        monkeypatch.setattr(src.data.storage, 'save', save)
+        deadline = time.time() + 5
+        while "Hello" not in (workspace['path'] / "data.log").read_text() and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        stop_flusher()
+
+    read_data()
+    assert retrieve_data()['messages'][0]['message'] == "Hello"
+
+# A data.json written before snapshots were versioned is migrated on load, and
+# its ids are integers again
+def test_snapshot_migrated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    clear_v1()
+    message = {'message_id': 5, 'u_id': 1, 'message': "Hello", 'time_created': 100, 'reacts': [], 'is_pinned': False}
+    user = {
+        'name_first': 'Bob',
+        'name_last': 'Builder',
+        'email': 'bob.builder@email.com',
+        'password': auth_password_hash('badpassword1'),
+        'handle_str': 'bobbuilder',
+        'permission_id': 1,
+        'sessions': [],
+        'is_removed': False,
+        'dms': [],
+        'notifications': [],
+    }
+    channel = {
+        'name': 'Channel1',
+        'is_public': True,
+        'owner_members': [1],
+        'all_members': [1],
+        'messages': [message],
+        'standup': {'is_active': False, 'time_finish': None},
+    }
+    legacy = {
+        'users': {'1': user},
+        'channels': {'2': channel},
+        'dms': {},
+        'messages': [dict(message, channel_id=2, dm_id=-1, is_removed=False, was_shared=False)],
+    }
+    (tmp_path / "data.json").write_text(json.dumps(legacy))
+
+    read_data()
+    token = auth_login_v1('bob.builder@email.com', 'badpassword1')['token']
+    assert channel_messages_v2(token, 2, 0)['messages'] == [message]
+    assert retrieve_data()['channels'][2]['standup']['messages'] == []
+    assert retrieve_data()['jobs'] == {}
+
+    (tmp_path / "data.json").write_text(json.dumps(dict(legacy, version=99)))
+    with pytest.raises(ValueError):
+        read_data()
+
+@pytest.fixture
+def sqlite_workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    set_storage('sqlite')
+    clear_v1()
+    yield tmp_path
+    set_storage('journal')
+
+# Every table survives a round trip through a binary snapshot
+def test_binary_round_trip(workspace):
+    user1, user2, channel1 = workspace['user1'], workspace['user2'], workspace['channel1']
+    set_storage('binary')
+    try:
+        dm_id = dm_create_v1(user1['token'], [user2['auth_user_id']])['dm_id']
+        message1 = message_send_v2(user1['token'], channel1, "Hello")['message_id']
+        message_react_v1(user1['token'], message1, 1)
+        message_sendlater_v1(user1['token'], channel1, "Later", time.time() + 3600)
+        write_data()
+        snapshot_data()
+        message_remove_v1(user1['token'], message1)
+        write_data()
+
+        before = retrieve_data()
+        read_data()
+        after = retrieve_data()
+
+        assert (workspace['path'] / "data.snap").exists()
+        assert after == before
+        assert after['dms'][dm_id]['members'] == [user1['auth_user_id'], user2['auth_user_id']]
+        assert after['channels'][channel1]['messages'][0].is_removed == True
+
+        # A damaged record is caught rather than loaded
+        snapshot = workspace['path'] / "data.snap"
+        snapshot.write_bytes(snapshot.read_bytes().replace(b"Hello", b"Jello"))
+        with pytest.raises(ValueError):
+            read_data()
+    finally:
+        set_storage('journal')
+
+# A binary snapshot cut short is damaged like any other, and the one before it
+# is loaded instead
+def test_binary_truncated(workspace):
+    user1, channel1 = workspace['user1'], workspace['channel1']
+    set_storage('binary')
+    try:
+        message_send_v2(user1['token'], channel1, "Hello")
+        write_data()
+        snapshot_data()
+        snapshot_data()
+        snapshot = workspace['path'] / "data.snap"
+        snapshot.write_bytes(snapshot.read_bytes()[:10])
+
+        read_data()
+        assert retrieve_data()['channels'][channel1]['messages'][0]['message'] == "Hello"
+    finally:
+        set_storage('journal')
+
+# The text of messages loaded from a binary snapshot is read from the file as
+# it's needed, and search and edits still see it
+def test_binary_texts_mapped(workspace):
+    user1, channel1 = workspace['user1'], workspace['channel1']
+    set_storage('binary')
+    try:
+        message1 = message_send_v2(user1['token'], channel1, "Hello")['message_id']
+        message_send_v2(user1['token'], channel1, "Hello again, ünïcode")
+        write_data()
+        snapshot_data()
+        read_data()
+
+        messages = retrieve_data()['channels'][channel1]['messages']
+        assert [message.text for message in messages] == [None, None]
+        assert [message['message'] for message in messages] == ["Hello", "Hello again, ünïcode"]
+        assert len(search_v2(user1['token'], "again")['messages']) == 1
+
+        message_edit_v2(user1['token'], message1, "Edited")
+        write_data()
+        snapshot_data()
+        read_data()
+        assert [message['message'] for message in retrieve_data()['channels'][channel1]['messages']] == [
+            "Edited", "Hello again, ünïcode"]
+    finally:
+        set_storage('journal')
+
+# Switching to binary snapshots starts from the json snapshot
+def test_binary_from_json(workspace):
+    user1, channel1 = workspace['user1'], workspace['channel1']
+    message_send_v2(user1['token'], channel1, "Hello")
+    write_data()
+    snapshot_data()
+
+    set_storage('binary')
+    try:
+        read_data()
+        assert retrieve_data()['channels'][channel1]['messages'][0]['message'] == "Hello"
+    finally:
+        set_storage('journal')
+
+# Every table survives a round trip through the sqlite engine
+def test_sqlite_round_trip(sqlite_workspace):
+    user1 = auth_register_v1('bob.builder@email.com', 'badpassword1', 'Bob', 'Builder')
+    user2 = auth_register_v1('shaun.sheep@email.com', 'password123', 'Shaun', 'Sheep')
+    channel1 = channels_create_v2(user1['token'], 'Channel1', True)['channel_id']
+    channel_invite_v2(user1['token'], channel1, user2['auth_user_id'])
+    dm_id = dm_create_v1(user1['token'], [user2['auth_user_id']])['dm_id']
+    message1 = message_send_v2(user1['token'], channel1, "Hello @shaunsheep")['message_id']
+    message_send_v2(user2['token'], channel1, "Hi")
+    message_react_v1(user2['token'], message1, 1)
+    message_sendlater_v1(user1['token'], channel1, "Later", time.time() + 3600)
+    write_data()
+    message_remove_v1(user1['token'], message1)
+    write_data()
+
+    before = retrieve_data()
+    read_data()
+    after = retrieve_data()
+
+    assert after == before
+    assert after['dms'][dm_id]['members'] == [user1['auth_user_id'], user2['auth_user_id']]
+    assert after['messages'][0].is_removed == True
+    assert after['messages'][0]['reacts'][0]['u_ids'] == [user2['auth_user_id']]
+
+# Users, channels and dms come back in the order they were created, which
+# their ids don't follow
+def test_sqlite_creation_order(sqlite_workspace):
+    user1 = auth_register_v1('bob.builder@email.com', 'badpassword1', 'Bob', 'Builder')
+    user2 = auth_register_v1('shaun.sheep@email.com', 'password123', 'Shaun', 'Sheep')
+    for number in range(6):
+        channels_create_v2(user1['token'], f"ch{number}", True)
+        dm_create_v1(user1['token'], [user2['auth_user_id']])
+    write_data()
+    auth_register_v1('pingu.penguin@email.com', 'password123', 'Pingu', 'Penguin')
+    user_profile_setname_v2(user1['token'], 'Robert', 'Builder')
+    write_data()
+
+    before = retrieve_data()
+    users, channels, dms = list(before['users']), list(before['channels']), list(before['dms'])
+    read_data()
+    after = retrieve_data()
+
+    assert list(after['users']) == users
+    assert list(after['channels']) == channels
+    assert list(after['dms']) == dms
+    assert [channel['name'] for channel in channels_listall_v2(user1['token'])['channels']] == [
+        f"ch{number}" for number in range(6)]
+
+# Deleting an entity removes its rows
+def test_sqlite_delete(sqlite_workspace):
+    user1 = auth_register_v1('bob.builder@email.com', 'badpassword1', 'Bob', 'Builder')
+    user2 = auth_register_v1('shaun.sheep@email.com', 'password123', 'Shaun', 'Sheep')
+    dm_id = dm_create_v1(user1['token'], [user2['auth_user_id']])['dm_id']
+    write_data()
+    dm_remove_v1(user1['token'], dm_id)
+    write_data()
+
+    read_data()
+    assert dm_id not in retrieve_data()['dms']
+    assert len(retrieve_data()['users']) == 2
+
+# The message index is rebuilt on load, so messages can still be found by id
+def test_message_index_rebuilt(workspace):
+    user1, channel1 = workspace['user1'], workspace['channel1']
+    message_id = message_send_v2(user1['token'], channel1, "Hello")['message_id']
+    write_data()
+
+    read_data()
+    assert src.data.get_message_record(message_id) is retrieve_data()['messages'][0]
+    message_edit_v2(user1['token'], message_id, "Edited")
+    assert retrieve_data()['channels'][channel1]['messages'][0]['message'] == "Edited"
+    assert src.data.get_message_record({'message_id': message_id}) is None
+
+# A message is one record shared by data['messages'] and its channel, and only
+# the fields the API returns are items of it
+def test_message_record_shared(workspace):
+    user1, channel1 = workspace['user1'], workspace['channel1']
+    message_send_v2(user1['token'], channel1, "Hello")
+    data = retrieve_data()
+
+    assert data['channels'][channel1]['messages'][0] is data['messages'][0]
+    assert set(data['messages'][0]) == {'message_id', 'u_id', 'message', 'time_created', 'reacts', 'is_pinned'}
+    assert data['messages'][0].channel_id == channel1
+
+# Records read and compare like the dictionaries they replace, and convert to
+# plain json for the API and for storage
+def test_records_convert(workspace):
+    user1, channel1 = workspace['user1'], workspace['channel1']
+    message_id = message_send_v2(user1['token'], channel1, "Hello")['message_id']
+    message_react_v1(user1['token'], message_id, 1)
+    record = src.data.get_message_record(message_id)
+
+    assert record['reacts'] == [{'react_id': 1, 'u_ids': [user1['auth_user_id']], 'is_this_user_reacted': False}]
+    assert json.loads(json.dumps(record, default=to_json)) == record.to_json()
+    assert 'channel_id' not in record.to_json()
+    assert Message.from_record(record.to_record()) == record
+    assert Message.from_record(record.to_record()).channel_id == channel1
+
+# Members behave like a set but keep the order they joined in, and persist as
+# a list
+def test_members_ordered():
+    members = Members([3, 1, 2])
+    members.append(1)
+    members.append(4)
+    members.remove(3)
+
+    assert members == [1, 2, 4]
+    assert members[0] == 1
+    assert 2 in members and 3 not in members and [] not in members
+    assert to_json(members) == [1, 2, 4]
+    with pytest.raises(ValueError):
+        members.remove(3)
+
+# Scheduled messages are persisted and still sent after a reload
+def test_scheduled_job_reloaded(workspace):
+    user1, channel1 = workspace['user1'], workspace['channel1']
+    message_sendlater_v1(user1['token'], channel1, "Later", time.time() + 1)
+    write_data()
+
+    read_data()
+    assert len(retrieve_data()['jobs']) == 1
+    time.sleep(1.5)
+    assert retrieve_data()['channels'][channel1]['messages'][0]['message'] == "Later"
+    assert retrieve_data()['jobs'] == {}
@@ -0,0 +1,39 @@
+# PROJECT-BACKEND: Team Echo
+
+import pytest
+
+import src.encoding
+from src.encoding import dumps, loads
+from src.records import Message, User
+
+# Both encoders give the same bytes, whichever is installed
+@pytest.fixture(params=['installed', 'stdlib'])
+def encoder(request, monkeypatch):
+    if request.param == 'stdlib':
+        monkeypatch.setattr(src.encoding, 'orjson', None)
+
+def test_dumps_records(encoder):
+    user = User('Bob', 'Builder', 'bob.builder@email.com', 'badpassword1', sessions=[3])
+    message = Message(1, 2, "Hello", 100, channel_id=5)
+
+    assert dumps({7: user, 'messages': [message]}) == (
+        b'{"7":{"name_first":"Bob","name_last":"Builder","email":"bob.builder@email.com",'
+        b'"password":"badpassword1","handle_str":"","permission_id":2,"sessions":[3],'
+        b'"is_removed":false,"dms":[],"notifications":[]},'
+        b'"messages":[{"message_id":1,"u_id":2,"message":"Hello","time_created":100,'
+        b'"reacts":[],"is_pinned":false}]}'
+    )
+
+def test_dumps_unicode(encoder):
+    assert dumps({'message': "ünï 🐑"}) == '{"message":"ünï 🐑"}'.encode()
+    assert loads(dumps({'message': "ünï 🐑"})) == {'message': "ünï 🐑"}
+
+# Floats may be written differently, but are the same value once read back
+def test_dumps_floats(encoder):
+    assert loads(dumps([1e20, 0.1, 1.5])) == [1e20, 0.1, 1.5]
+
+def test_loads(encoder):
+    assert loads(b'{"1": [1, "a", null]}') == {'1': [1, 'a', None]}
+    assert loads('{"1": true}') == {'1': True}
+    with pytest.raises(ValueError):
+        loads(b'{"table": "users", "ke')
@@ -134,7 +134,7 @@ def test_message_unreact_v1_channel():
 
     message_unreact_v1(user1["token"], message_id['message_id'], like)
 
-    assert len(data['messages'][0]["reacts"]) == 0
+    assert data['messages'][0]["reacts"][0]["u_ids"] == []
 
 # Testing for user unreacting to another user's in dm
 def test_message_unreact_v1_dm():
@@ -152,7 +152,7 @@ def test_message_unreact_v1_dm():
 
     message_unreact_v1(user1["token"], message_id['message_id'], like)
 
-    assert len(data['messages'][0]["reacts"]) == 0
+    assert data['messages'][0]["reacts"][0]["u_ids"] == []
 
 
 # Testing for user unreacting from themselves
@@ -171,7 +171,7 @@ def test_message_unreact_v1_self():
 
     message_unreact_v1(user1["token"], message_id['message_id'], like)
 
-    assert len(data['messages'][0]["reacts"]) == 0
+    assert data['messages'][0]["reacts"][0]["u_ids"] == []
 
 # Testing for unreacts on different messages
 def test_message_unreact_v1_different_messages():
@@ -202,8 +202,8 @@ def test_message_unreact_v1_different_messages():
     message_unreact_v1(user1["token"], message_id1['message_id'], like)
     message_unreact_v1(user1["token"], message_id2['message_id'], like)
 
-    assert len(data['messages'][0]["reacts"]) == 0
-    assert len(data['messages'][1]["reacts"]) == 0
+    assert data['messages'][0]["reacts"][0]["u_ids"] == []
+    assert data['messages'][1]["reacts"][0]["u_ids"] == []
     assert len(data['messages'][2]["reacts"]) == 1
 
 
@@ -246,7 +246,7 @@ def test_message_unreact_v1_loop_react_unreact():
     x = 0
     while x < 10:
         message_unreact_v1(user1["token"], message_id['message_id'], like)
-        assert len(data['messages'][0]["reacts"]) == 0
+        assert data['messages'][0]["reacts"][0]["u_ids"] == []
 
         message_react_v1(user1["token"], message_id['message_id'], like)
         assert data['messages'][0]["reacts"][0]["u_ids"] == [user1["auth_user_id"]]
@@ -414,4 +414,41 @@ def test_notif_channels_max():
                 'notification_message' : 'first1last1 added you to first1last1, first3last3',
             },
         ]
-    }
\ No newline at end of file
+    }
+
+# Test for tagging several users in one message. Each member tagged is notified
+# once, users outside the channel or dm aren't
+def test_multitag_notif():
+    setup = setup_users()
+    user1 = setup['user1']
+    user2 = setup['user2']
+    user3 = setup['user3']
+    # Handle first1last10
+    user4 = auth_register_v1('example4@hotmail.com', 'password4', 'first1', 'last1')
+
+    chid1 = channels_create_v2(user1['token'], 'Channel1', True)
+    channel_invite_v2(user1['token'], chid1['channel_id'], user2['auth_user_id'])
+    channel_invite_v2(user1['token'], chid1['channel_id'], user4['auth_user_id'])
+    message_send_v2(user1['token'], chid1['channel_id'], '@first2last2 @first3last3 @first1last10 @first2last2')
+
+    tagged = {
+        'channel_id' : chid1['channel_id'],
+        'dm_id' : -1,
+        'notification_message' : 'first1last1 tagged you in Channel1: @first2last2 @first3',
+    }
+    assert notifications_get_v1(user2['token'])['notifications'][1:] == [tagged]
+    assert notifications_get_v1(user3['token']) == {'notifications': []}
+    assert notifications_get_v1(user4['token'])['notifications'][1:] == [tagged]
+    assert notifications_get_v1(user1['token']) == {'notifications': []}
+
+    dmid1 = dm_create_v1(user1['token'], [user2['auth_user_id'], user3['auth_user_id']])
+    message_senddm_v1(user1['token'], dmid1['dm_id'], 'hi @first3last3, @first2last2 and @first1last10')
+
+    tagged = {
+        'channel_id' : -1,
+        'dm_id' : dmid1['dm_id'],
+        'notification_message' : 'first1last1 tagged you in first1last1, first2last2, first3last3: hi @first3last3, @fi',
+    }
+    assert notifications_get_v1(user2['token'])['notifications'][-1] == tagged
+    assert notifications_get_v1(user3['token'])['notifications'][-1] == tagged
+    assert len(notifications_get_v1(user4['token'])['notifications']) == 2
@@ -0,0 +1,83 @@
+# PROJECT-BACKEND: Team Echo
+
+import pytest
+
+from src.error import InputError, AccessError
+from src.auth import auth_register_v1
+from src.channel import channel_invite_v2
+from src.channels import channels_create_v2
+from src.data import read_data, write_data
+from src.message import message_send_v2
+from src.notifications import notifications_get_v1, notifications_get_v2
+from src.other import clear_v1
+from src.server import APP
+
+# Set up users whose handles can be tagged
+@pytest.fixture
+def users():
+    clear_v1()
+    return {
+        'user1': auth_register_v1('example1@hotmail.com', 'password1', 'first1', 'last1'),
+        'user2': auth_register_v1('example2@hotmail.com', 'password2', 'first2', 'last2'),
+    }
+
+# Test for an invalid token and cursor
+def test_notif_v2_invalid(users):
+
+    with pytest.raises(AccessError):
+        notifications_get_v2("Invalid token", -1)
+    with pytest.raises(InputError):
+        notifications_get_v2(users['user1']['token'], "Invalid cursor")
+
+# A cursor that isn't a number is an InputError over http too
+def test_notif_v2_invalid_http(users):
+    client = APP.test_client()
+    response = client.get('/notifications/get/v2', query_string={'token': users['user1']['token'], 'cursor': "abc"})
+    assert response.status_code == InputError.code
+
+# Test for reading only the notifications after the cursor
+def test_notif_v2_cursor(users):
+
+    assert notifications_get_v2(users['user2']['token']) == {'notifications': [], 'cursor': -1}
+
+    channel_id = channels_create_v2(users['user1']['token'], "Channel", True)['channel_id']
+    channel_invite_v2(users['user1']['token'], channel_id, users['user2']['auth_user_id'])
+    first = notifications_get_v2(users['user2']['token'])
+    assert first == {
+        'notifications': [{
+            'channel_id': channel_id,
+            'dm_id': -1,
+            'notification_message': 'first1last1 added you to Channel',
+        }],
+        'cursor': 0,
+    }
+
+    message_send_v2(users['user1']['token'], channel_id, '@first2last2 hi')
+    second = notifications_get_v2(users['user2']['token'], first['cursor'])
+    assert second == {
+        'notifications': [{
+            'channel_id': channel_id,
+            'dm_id': -1,
+            'notification_message': 'first1last1 tagged you in Channel: @first2last2 hi',
+        }],
+        'cursor': 1,
+    }
+    assert notifications_get_v2(users['user2']['token'], second['cursor'])['notifications'] == []
+
+# Test for only keeping the 20 most recent, and numbering them the same once
+# the store is reloaded
+def test_notif_v2_wrap(users):
+
+    channel_id = channels_create_v2(users['user1']['token'], "Channel", True)['channel_id']
+    channel_invite_v2(users['user1']['token'], channel_id, users['user2']['auth_user_id'])
+    for x in range(30):
+        message_send_v2(users['user1']['token'], channel_id, '@first2last2 ' + str(x))
+
+    for _ in range(2):
+        assert len(notifications_get_v1(users['user2']['token'])['notifications']) == 20
+        latest = notifications_get_v2(users['user2']['token'], 27)
+        assert latest['cursor'] == 30
+        assert [notification['notification_message'][-2:] for notification in latest['notifications']] == ['27', '28', '29']
+        assert len(notifications_get_v2(users['user2']['token'])['notifications']) == 20
+        write_data()
+        read_data()
@@ -7,7 +7,7 @@ from src.error import InputError, AccessError
 from src.channel import channel_invite_v2, channel_join_v2, channel_leave_v1
 from src.channels import channels_create_v2
 from src.dm import dm_create_v1, dm_leave_v1
-from src.message import message_send_v2, message_senddm_v1
+from src.message import message_send_v2, message_senddm_v1, message_edit_v2, message_remove_v1
 from src.other import clear_v1, search_v2
 
 #################################################################################
@@ -37,16 +37,26 @@ def test_search_no_channel(setup_user):
 def test_search_standard(setup_user):
     users = setup_user
     channel_id1 = channels_create_v2(users['user1']['token'], "Public Channel", True)
-    message_send_v2(users['user1']['token'], channel_id1['channel_id'], "A message in no channels")
+    message_id1 = message_send_v2(users['user1']['token'], channel_id1['channel_id'], "A message in no channels")
 
     channel_invite_v2(users['user1']['token'], channel_id1['channel_id'], users['user2']['auth_user_id'])
-    message_send_v2(users['user2']['token'], channel_id1['channel_id'], "A message in channels")
+    message_id2 = message_send_v2(users['user2']['token'], channel_id1['channel_id'], "A message in channels")
 
     dm_id1 = dm_create_v1(users['user2']['token'], [users['user3']['auth_user_id']])
-    message_senddm_v1(users['user2']['token'], dm_id1['dm_id'], "A message in channels")
+    message_id3 = message_senddm_v1(users['user2']['token'], dm_id1['dm_id'], "A message in channels")
 
+    # Equally ranked messages come most recent first
     msg = search_v2(users['user2']['token'], "message")
-    assert msg['messages'] == ["A message in no channels", "A message in channels", "A message in channels"]
+    assert [message['message_id'] for message in msg['messages']] == \
+        [message_id3['message_id'], message_id2['message_id'], message_id1['message_id']]
+    assert msg['messages'][2] == {
+        'message_id': message_id1['message_id'],
+        'u_id': users['user1']['auth_user_id'],
+        'message': "A message in no channels",
+        'time_created': msg['messages'][2]['time_created'],
+        'reacts': [],
+        'is_pinned': False,
+    }
 
     #assert len(search_v2(users['user2']['token'], 'message')) == 3
 
@@ -149,4 +159,28 @@ def test_search_empty_query(setup_user):
 
     dm_leave_v1(users['user2']['token'], dm_id1['dm_id'])
 
-    assert len(search_v2(users['user2']['token'], '')['messages']) == 3
\ No newline at end of file
+    assert len(search_v2(users['user2']['token'], '')['messages']) == 3
+# Testing messages with more occurrences of the query are ranked first
+def test_search_ranked(setup_user):
+    users = setup_user
+    channel_id1 = channels_create_v2(users['user1']['token'], "Public Channel", True)
+    message_send_v2(users['user1']['token'], channel_id1['channel_id'], 'hello')
+    message_send_v2(users['user1']['token'], channel_id1['channel_id'], 'hello hello hello')
+    message_send_v2(users['user1']['token'], channel_id1['channel_id'], 'hello hello')
+
+    msg = search_v2(users['user1']['token'], 'hello')
+    assert [message['message'] for message in msg['messages']] == ['hello hello hello', 'hello hello', 'hello']
+
+# Testing edited messages are found by their new text and removed ones not at all
+def test_search_edit_remove(setup_user):
+    users = setup_user
+    channel_id1 = channels_create_v2(users['user1']['token'], "Public Channel", True)
+    message_id1 = message_send_v2(users['user1']['token'], channel_id1['channel_id'], 'first draft')
+    message_id2 = message_send_v2(users['user1']['token'], channel_id1['channel_id'], 'draft to remove')
+
+    message_edit_v2(users['user1']['token'], message_id1['message_id'], 'final version')
+    message_remove_v1(users['user1']['token'], message_id2['message_id'])
+
+    assert search_v2(users['user1']['token'], 'draft')['messages'] == []
+    assert len(search_v2(users['user1']['token'], 'final')['messages']) == 1
+    assert len(search_v2(users['user1']['token'], 'al v')['messages']) == 1
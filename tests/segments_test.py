@@ -0,0 +1,65 @@
+# PROJECT-BACKEND: Team Echo
+
+import json
+import pytest
+
+import src.data
+import src.segments
+from src import config
+from src.data import retrieve_data, read_data, write_data
+from src.auth import auth_register_v1
+from src.channels import channels_create_v2
+from src.channel import channel_messages_v2
+from src.message import message_send_v2, message_edit_v2
+from src.other import clear_v1, search_v2
+
+# Channels keep 2 messages in memory and freeze older ones 2 at a time, with
+# a single segment cached
+@pytest.fixture
+def frozen(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, 'message_tail', 2)
+    monkeypatch.setattr(config, 'segment_size', 2)
+    monkeypatch.setattr(src.data.segments, 'resident', 1)
+    clear_v1()
+    user1 = auth_register_v1('bob.builder@email.com', 'badpassword1', 'Bob', 'Builder')
+    channel1 = channels_create_v2(user1['token'], 'Channel1', True)['channel_id']
+    message_ids = [message_send_v2(user1['token'], channel1, f"Message {number}")['message_id']
+                   for number in range(7)]
+    return {'user1': user1, 'channel1': channel1, 'message_ids': message_ids}
+
+def texts(token, channel_id):
+    return [message['message'] for message in channel_messages_v2(token, channel_id, 0)['messages']]
+
+def test_old_messages_frozen(frozen):
+    user1, channel1 = frozen['user1'], frozen['channel1']
+
+    assert [message.text for message in retrieve_data()['messages']] == [
+        None, None, None, None, "Message 4", "Message 5", "Message 6"]
+    assert texts(user1['token'], channel1) == [f"Message {number}" for number in reversed(range(7))]
+    assert len(src.data.segments.cache) == 1
+
+def test_frozen_messages_change(frozen):
+    user1, channel1, message_ids = frozen['user1'], frozen['channel1'], frozen['message_ids']
+
+    message_edit_v2(user1['token'], message_ids[1], "Edited")
+    assert texts(user1['token'], channel1)[-2] == "Edited"
+    assert [message['message'] for message in search_v2(user1['token'], "Message 0")['messages']] == ["Message 0"]
+
+    # The storage engine persists frozen text like any other
+    write_data()
+    read_data()
+    assert texts(user1['token'], channel1) == [
+        "Message 6", "Message 5", "Message 4", "Message 3", "Message 2", "Edited", "Message 0"]
+
+# Search checks candidates in the order they were sent, reading each segment
+# once rather than once per message (the first search also reads them to
+# build the index)
+def test_search_reads_segments_once(frozen, monkeypatch):
+    src.data.message_search.search("Message")
+    loads = []
+    monkeypatch.setattr(src.segments, 'loads', lambda text: loads.append(text) or json.loads(text))
+    src.data.segments.cache.clear()
+    assert len(src.data.message_search.search("Message")) == 7
+
+    assert len(loads) == 2
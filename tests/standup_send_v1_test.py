@@ -4,7 +4,7 @@
 import pytest
 
 from src.error import InputError, AccessError
-from src.standup import standup_start_v1, standup_send_v1
+from src.standup import standup_start_v1, standup_send_v1, standup_chunks
 from src.channels import channels_create_v2
 from src.channel import channel_messages_v2, channel_invite_v2
 from datetime import datetime
@@ -72,6 +72,27 @@ user2_firstuser2_las: Test message2
 user3_firstuser3_las: Test message3
 user4_firstuser4_las: Test message4'''
 
+def test_concurrent_standups(users):
+    ch_id0 = channels_create_v2(users[0]['token'], "Channel0", True)
+    ch_id1 = channels_create_v2(users[1]['token'], "Channel1", True)
+    standup_start_v1(users[0]['token'], ch_id0['channel_id'], 1)
+    standup_start_v1(users[1]['token'], ch_id1['channel_id'], 1)
+
+    standup_send_v1(users[0]['token'], ch_id0['channel_id'], "In channel0")
+    standup_send_v1(users[1]['token'], ch_id1['channel_id'], "In channel1")
+
+    time.sleep(2)
+
+    messages_list = channel_messages_v2(users[0]["token"], ch_id0['channel_id'], 0)
+    assert [message["message"] for message in messages_list['messages']] == ["user0_firstuser0_las: In channel0"]
+    messages_list = channel_messages_v2(users[1]["token"], ch_id1['channel_id'], 0)
+    assert [message["message"] for message in messages_list['messages']] == ["user1_firstuser1_las: In channel1"]
+
+def test_standup_chunks():
+    assert standup_chunks(["a" * 600, "b" * 300, "c" * 200]) == ["a" * 600 + "\n" + "b" * 300, "c" * 200]
+    assert standup_chunks(["x: " + "d" * 1000]) == ["x: " + "d" * 997, "ddd"]
+    assert standup_chunks([]) == []
+
 def test_invalid_channel_id(users):
     with pytest.raises(InputError):
         standup_send_v1(users[0]['token'], 12345, "Test message0")
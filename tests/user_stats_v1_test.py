@@ -4,12 +4,12 @@
 import pytest
 
 from src.error import InputError, AccessError
-from src.channel import channel_invite_v2, channel_join_v2
+from src.channel import channel_invite_v2, channel_join_v2, channel_leave_v1
 from src.auth import auth_register_v1
 from src.channels import channels_create_v2
-from src.dm import dm_create_v1, dm_invite_v1
-from src.message import message_send_v2, message_senddm_v1
-from src.data import retrieve_data
+from src.dm import dm_create_v1, dm_invite_v1, dm_leave_v1, dm_remove_v1
+from src.message import message_send_v2, message_senddm_v1, message_remove_v1
+from src.data import retrieve_data, read_data, write_data
 from src.user import user_stats_v1
 from src.other import clear_v1
 
@@ -175,3 +175,52 @@ def test_user_stats_v1_active():
         'num_msgs_sent': 7,
         'involvement': 1,
     }
+
+# Test stats after leaving channels and dms, and once the store is reloaded
+def test_user_stats_v1_leave():
+    setup = set_up_data()
+    user1, user2 = setup['user1'], setup['user2']
+    channel1 = channels_create_v2(user1['token'], 'Channel1', True)
+    channel_join_v2(user2['token'], channel1['channel_id'])
+    dmid1 = dm_create_v1(user1['token'], [user2['auth_user_id']])
+    dmid2 = dm_create_v1(user1['token'], [user2['auth_user_id']])
+    message_send_v2(user2["token"], channel1['channel_id'], "Hi i'm user2 ch")
+
+    channel_leave_v1(user2['token'], channel1['channel_id'])
+    dm_leave_v1(user2['token'], dmid1['dm_id'])
+    dm_remove_v1(user1['token'], dmid2['dm_id'])
+
+    expected = {
+        'num_channels_joined': 0,
+        'num_dms_joined': 0,
+        'num_msgs_sent': 1,
+        'involvement': 1 / 3,
+    }
+    assert user_stats_v1(user2['token']) == expected
+
+    write_data()
+    read_data()
+    assert user_stats_v1(user2['token']) == expected
+
+# Removed messages don't count towards the messages that exist, like users/stats
+def test_user_stats_v1_removed_message():
+    setup = set_up_data()
+    user1, user2 = setup['user1'], setup['user2']
+    channel1 = channels_create_v2(user1['token'], 'Channel1', True)
+    channel_join_v2(user2['token'], channel1['channel_id'])
+    message1 = message_send_v2(user1["token"], channel1['channel_id'], "Hi i'm user1 ch")
+    message_send_v2(user1["token"], channel1['channel_id'], "Hi again")
+    message_send_v2(user2["token"], channel1['channel_id'], "Hi i'm user2 ch")
+    message_remove_v1(user1['token'], message1['message_id'])
+
+    expected = {
+        'num_channels_joined': 1,
+        'num_dms_joined': 0,
+        'num_msgs_sent': 1,
+        'involvement': 2 / 3,
+    }
+    assert user_stats_v1(user2['token']) == expected
+
+    write_data()
+    read_data()
+    assert user_stats_v1(user2['token']) == expected
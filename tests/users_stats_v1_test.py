@@ -7,9 +7,9 @@ from src.error import InputError, AccessError
 from src.channel import channel_invite_v2, channel_join_v2
 from src.auth import auth_register_v1
 from src.channels import channels_create_v2
-from src.dm import dm_create_v1, dm_invite_v1
-from src.message import message_send_v2, message_senddm_v1
-from src.data import retrieve_data
+from src.dm import dm_create_v1, dm_invite_v1, dm_remove_v1
+from src.message import message_send_v2, message_senddm_v1, message_remove_v1
+from src.data import retrieve_data, read_data, write_data
 from src.user import users_stats_v1
 from datetime import datetime
 from src.other import clear_v1
@@ -22,6 +22,8 @@ from src.other import clear_v1
 # Messages that are sent using send_message are appended to the message list
 # within the channel
 
+# Each list holds a point for every change of its total, starting from 0 when
+# the workspace was created
 
 ###############################################################################
 #                               HELPER FUNCTIONS                              #
@@ -91,8 +93,8 @@ def test_users_stats_v1_no_msg():
 
     time_stamp = round(datetime.now().timestamp())
     assert users_stats_v1(user1['token']) == {
-        'channels_exist': [{'num_channels_exist': 1, 'time_stamp': time_stamp}],
-        'dms_exist': [{'num_dms_exist': 1, 'time_stamp': time_stamp}],
+        'channels_exist': [{'num_channels_exist': n, 'time_stamp': time_stamp} for n in range(2)],
+        'dms_exist': [{'num_dms_exist': n, 'time_stamp': time_stamp} for n in range(2)],
         'messages_exist': [{'num_messages_exist': 0, 'time_stamp': time_stamp}],
         'utilization_rate': 1,
     }
@@ -110,9 +112,9 @@ def test_users_stats_v1_loner():
 
     time_stamp = round(datetime.now().timestamp())
     assert users_stats_v1(user1['token']) == {
-        'channels_exist': [{'num_channels_exist': 1, 'time_stamp': time_stamp}],
+        'channels_exist': [{'num_channels_exist': n, 'time_stamp': time_stamp} for n in range(2)],
         'dms_exist': [{'num_dms_exist': 0, 'time_stamp': time_stamp}],
-        'messages_exist': [{'num_messages_exist': 4, 'time_stamp': time_stamp}],
+        'messages_exist': [{'num_messages_exist': n, 'time_stamp': time_stamp} for n in range(5)],
         'utilization_rate': 1,
     }
 
@@ -139,9 +141,9 @@ def test_users_stats_v1_invite_join():
 
     time_stamp = round(datetime.now().timestamp())
     assert users_stats_v1(user1['token']) == {
-        'channels_exist': [{'num_channels_exist': 1, 'time_stamp': time_stamp}],
-        'dms_exist': [{'num_dms_exist': 1, 'time_stamp': time_stamp}],
-        'messages_exist': [{'num_messages_exist': 6, 'time_stamp': time_stamp}],
+        'channels_exist': [{'num_channels_exist': n, 'time_stamp': time_stamp} for n in range(2)],
+        'dms_exist': [{'num_dms_exist': n, 'time_stamp': time_stamp} for n in range(2)],
+        'messages_exist': [{'num_messages_exist': n, 'time_stamp': time_stamp} for n in range(7)],
         'utilization_rate': 1,
     }
 
@@ -159,9 +161,9 @@ def test_users_stats_v1_partial_util():
 
     time_stamp = round(datetime.now().timestamp())
     assert users_stats_v1(user1['token']) == {
-        'channels_exist': [{'num_channels_exist': 1, 'time_stamp': time_stamp}],
+        'channels_exist': [{'num_channels_exist': n, 'time_stamp': time_stamp} for n in range(2)],
         'dms_exist': [{'num_dms_exist': 0, 'time_stamp': time_stamp}],
-        'messages_exist': [{'num_messages_exist': 1, 'time_stamp': time_stamp}],
+        'messages_exist': [{'num_messages_exist': n, 'time_stamp': time_stamp} for n in range(2)],
         'utilization_rate': 0.25,
     }
 
@@ -193,28 +195,56 @@ def test_users_stats_v1_active():
 
     time_stamp = round(datetime.now().timestamp())
     assert users_stats_v1(user1['token']) == {
-        'channels_exist': [{'num_channels_exist': 5, 'time_stamp': time_stamp}],
-        'dms_exist': [{'num_dms_exist': 5, 'time_stamp': time_stamp}],
-        'messages_exist': [{'num_messages_exist': 7, 'time_stamp': time_stamp}],
+        'channels_exist': [{'num_channels_exist': n, 'time_stamp': time_stamp} for n in range(6)],
+        'dms_exist': [{'num_dms_exist': n, 'time_stamp': time_stamp} for n in range(6)],
+        'messages_exist': [{'num_messages_exist': n, 'time_stamp': time_stamp} for n in range(8)],
         'utilization_rate': 0.5,
     }
     assert users_stats_v1(user2['token']) == {
-        'channels_exist': [{'num_channels_exist': 5, 'time_stamp': time_stamp}],
-        'dms_exist': [{'num_dms_exist': 5, 'time_stamp': time_stamp}],
-        'messages_exist': [{'num_messages_exist': 7, 'time_stamp': time_stamp}],
+        'channels_exist': [{'num_channels_exist': n, 'time_stamp': time_stamp} for n in range(6)],
+        'dms_exist': [{'num_dms_exist': n, 'time_stamp': time_stamp} for n in range(6)],
+        'messages_exist': [{'num_messages_exist': n, 'time_stamp': time_stamp} for n in range(8)],
         'utilization_rate': 0.5,
     }
 
     assert users_stats_v1(user3['token']) == {
-        'channels_exist': [{'num_channels_exist': 5, 'time_stamp': time_stamp}],
-        'dms_exist': [{'num_dms_exist': 5, 'time_stamp': time_stamp}],
-        'messages_exist': [{'num_messages_exist': 7, 'time_stamp': time_stamp}],
+        'channels_exist': [{'num_channels_exist': n, 'time_stamp': time_stamp} for n in range(6)],
+        'dms_exist': [{'num_dms_exist': n, 'time_stamp': time_stamp} for n in range(6)],
+        'messages_exist': [{'num_messages_exist': n, 'time_stamp': time_stamp} for n in range(8)],
         'utilization_rate': 0.5,
     }
 
     assert users_stats_v1(user4['token']) == {
-        'channels_exist': [{'num_channels_exist': 5, 'time_stamp': time_stamp}],
-        'dms_exist': [{'num_dms_exist': 5, 'time_stamp': time_stamp}],
-        'messages_exist': [{'num_messages_exist': 7, 'time_stamp': time_stamp}],
+        'channels_exist': [{'num_channels_exist': n, 'time_stamp': time_stamp} for n in range(6)],
+        'dms_exist': [{'num_dms_exist': n, 'time_stamp': time_stamp} for n in range(6)],
+        'messages_exist': [{'num_messages_exist': n, 'time_stamp': time_stamp} for n in range(8)],
         'utilization_rate': 0.5,
     }
+
+# Test the history going down as messages and dms are removed, and being kept
+# once the store is reloaded
+def test_users_stats_v1_history(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    clear_v1()
+    user1 = auth_register_v1('user1@gmail.com', 'password123', 'first1', 'last1')
+    user2 = auth_register_v1('user2@gmail.com', 'password123', 'first2', 'last2')
+
+    channel1 = channels_create_v2(user1['token'], 'Channel1', True)
+    dmid1 = dm_create_v1(user1['token'], [user2['auth_user_id']])
+    message_id1 = message_send_v2(user1["token"], channel1['channel_id'], "Message 1")
+    message_send_v2(user1["token"], channel1['channel_id'], "Message 2")
+    message_remove_v1(user1['token'], message_id1['message_id'])
+    dm_remove_v1(user1['token'], dmid1['dm_id'])
+
+    time_stamp = round(datetime.now().timestamp())
+    expected = {
+        'channels_exist': [{'num_channels_exist': n, 'time_stamp': time_stamp} for n in (0, 1)],
+        'dms_exist': [{'num_dms_exist': n, 'time_stamp': time_stamp} for n in (0, 1, 0)],
+        'messages_exist': [{'num_messages_exist': n, 'time_stamp': time_stamp} for n in (0, 1, 2, 1)],
+        'utilization_rate': 0.5,
+    }
+    assert users_stats_v1(user1['token']) == expected
+
+    write_data()
+    read_data()
+    assert users_stats_v1(user1['token']) == expected